@@ -0,0 +1,200 @@
+# Overview
+# - Contains a local stand-in for the parts of Discord the cogs talk to: the bot, channels, messages, reactions & interactions
+# - Every call that would be a REST request in discord.py waits for a configurable simulated latency and is counted by type,
+#   so benchmarks can report REST calls per operation
+# - Messages are created lazily the first time they are fetched, so stores with 100k suggestions need no set-up
+
+# Libraries to import
+import asyncio
+import itertools
+from collections import Counter
+
+# Simulated Discord REST API: every call waits `latency` seconds and is counted by type
+class FakeREST:
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = Counter()      # Call type (e.g. "fetch_message") -> count
+
+    async def call(self, kind: str):
+        self.calls[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def total(self):
+        return sum(self.calls.values())
+
+# A Discord user (or the bot itself)
+class FakeUser:
+    def __init__(self, user_id: int, name: str = None):
+        self.id = user_id
+        self.name = name or f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.display_avatar = FakeAsset(f"https://cdn.example/avatars/{user_id}.png")
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+# A custom emoji (tick/cross)
+class FakeEmoji:
+    def __init__(self, name: str, emoji_id: int):
+        self.name = name
+        self.id = emoji_id
+
+    def __str__(self):
+        return f"<:{self.name}:{self.id}>"
+
+# The payload of a raw reaction add/remove event
+class FakeReactionPayload:
+    def __init__(self, channel_id: int, message_id: int, user_id: int, emoji: FakeEmoji):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.user_id = user_id
+        self.emoji = emoji
+
+# A message in a channel (reactions are kept as {emoji string: set of user IDs})
+class FakeMessage:
+    def __init__(self, channel, message_id: int):
+        self.channel = channel
+        self.id = message_id
+        self.reactions = {}
+        self.deleted = False
+
+    async def delete(self):
+        await self.channel.bot.rest.call("delete_message")
+        self.deleted = True
+        self.channel.messages.pop(self.id, None)
+
+    async def add_reaction(self, emoji):
+        await self.channel.bot.rest.call("add_reaction")
+        self.reactions.setdefault(str(emoji), set()).add(self.channel.bot.user.id)
+
+    # Removing someone's reaction makes Discord send a reaction remove event, like the real gateway does
+    async def remove_reaction(self, emoji, member):
+        await self.channel.bot.rest.call("remove_reaction")
+        users = self.reactions.get(str(emoji), set())
+        if member.id in users:
+            users.discard(member.id)
+            self.channel.bot.emit_reaction_remove(self.channel.id, self.id, member.id, str(emoji))
+
+# A text channel
+class FakeChannel:
+    def __init__(self, bot, channel_id: int):
+        self.bot = bot
+        self.id = channel_id
+        self.messages = {}      # Message ID -> FakeMessage
+        self.sent = 0
+
+    def get_partial_message(self, message_id: int):
+        return self._message(message_id)
+
+    async def fetch_message(self, message_id: int):
+        await self.bot.rest.call("fetch_message")
+        return self._message(message_id)
+
+    async def send(self, content=None, **kwargs):
+        await self.bot.rest.call("send_message")
+        self.sent += 1
+        return self._message(next(self.bot.snowflakes))
+
+    # Messages are created on first use (every stored suggestion is assumed to exist on "Discord")
+    def _message(self, message_id: int):
+        message = self.messages.get(message_id)
+        if message is None:
+            message = self.messages[message_id] = FakeMessage(self, message_id)
+        return message
+
+# Interaction response (the first reply to a command, button or modal)
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    async def _respond(self, kind: str):
+        await self.interaction.bot.rest.call(kind)
+        self.done = True
+
+    async def defer(self, **kwargs):
+        await self._respond("interaction_defer")
+
+    async def send_message(self, content=None, **kwargs):
+        self.interaction.replies.append(content)
+        await self._respond("interaction_response")
+
+    async def edit_message(self, **kwargs):
+        await self._respond("interaction_response")
+
+    async def send_modal(self, modal):
+        await self._respond("interaction_response")
+
+# Follow-up messages sent after deferring
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.replies.append(content)
+        await self.interaction.bot.rest.call("interaction_followup")
+
+# A slash command, button or modal interaction from a user
+class FakeInteraction:
+    def __init__(self, bot, user: FakeUser):
+        self.bot = bot
+        self.client = bot
+        self.user = user
+        self.guild_id = None    # The benchmark guild answers to any guild ID
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.replies = []       # Text of every reply, for checking results
+
+# The bot: gives the cogs the same attributes & lookups as commands.Bot, backed by fake channels
+class FakeBot:
+    def __init__(self, rest: FakeREST, bot_id: int = 981854054760185927):
+        self.rest = rest
+        self.user = FakeUser(bot_id, "TE Suggestions")
+        self.snowflakes = itertools.count(10 ** 18)    # IDs for new messages
+        self._channels = {}
+        self._emojis = {}
+        self._reaction_remove_handler = None
+        self._events = set()    # Reaction remove events still being handled
+
+    def get_channel(self, channel_id: int):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self._channels[channel_id] = FakeChannel(self, channel_id)
+        return channel
+
+    def get_partial_messageable(self, channel_id: int):
+        return self.get_channel(channel_id)
+
+    def add_emoji(self, emoji: FakeEmoji):
+        self._emojis[emoji.id] = emoji
+
+    def get_emoji(self, emoji_id: int):
+        return self._emojis.get(emoji_id)
+
+    # Only members in the gateway cache are found without a REST call (none, here)
+    def get_user(self, user_id: int):
+        return None
+
+    async def fetch_user(self, user_id: int):
+        await self.rest.call("fetch_user")
+        return FakeUser(user_id)
+
+    # Call this handler (e.g. Events.on_raw_reaction_remove) whenever a reaction is removed by the bot
+    def on_reaction_remove(self, handler):
+        self._reaction_remove_handler = handler
+
+    def emit_reaction_remove(self, channel_id: int, message_id: int, user_id: int, emoji: str):
+        if self._reaction_remove_handler is not None:
+            emoji = next((e for e in self._emojis.values() if str(e) == emoji), None)
+            payload = FakeReactionPayload(channel_id, message_id, user_id, emoji)
+            task = asyncio.get_running_loop().create_task(self._reaction_remove_handler(payload))
+            self._events.add(task)
+            task.add_done_callback(self._events.discard)
+
+    # Wait for every emitted event to be handled
+    async def drain(self):
+        while self._events:
+            await asyncio.gather(*self._events, return_exceptions=True)
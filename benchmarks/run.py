@@ -0,0 +1,104 @@
+# Overview
+# - Command-line entry point for the benchmarks: python -m benchmarks.run [options]
+# - Runs each workload against a fresh environment for every store size and prints
+#   throughput, p50/p99 latency & REST calls per operation
+# - --save-baseline writes the results to a JSON file; --baseline compares a run against one and flags regressions
+# Examples:
+#   python -m benchmarks.run --sizes 100,10000 --latency 0.05
+#   python -m benchmarks.run --workloads reaction_storm --voters 5000 --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run --baseline benchmarks/baseline.json
+
+# Libraries to import
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+from benchmarks.workloads import Environment, workloads
+
+# Relative change that counts as a regression when comparing against a baseline
+default_tolerance = 0.10
+# Summary fields compared against a baseline, and whether higher is better
+compared_fields = {"throughput": True, "p50_ms": False, "p99_ms": False, "rest_per_op": False}
+
+# Run every selected workload for every store size, returning {"workload@size": summary}
+async def run_benchmarks(args):
+    results = {}
+    for size in args.sizes:
+        for name in args.workloads:
+            workload, settings = workloads[name]
+            with tempfile.TemporaryDirectory() as directory:
+                env = Environment(directory, size, storage=args.storage, latency=args.latency)
+                await env.start()
+                try:
+                    result = await workload(env, **{setting: getattr(args, setting) for setting in settings})
+                finally:
+                    await env.stop()
+            results[f"{name}@{size}"] = summary = result.summary()
+            print_summary(f"{name}@{size}", summary)
+    return results
+
+def print_summary(key: str, summary: dict):
+    checks = ", ".join(f"{check}={value}" for check, value in summary["checks"].items())
+    print(
+        f"{key:<28} {summary['ops']:>6} ops  {summary['throughput']:>9.1f} ops/s  "
+        f"p50 {summary['p50_ms']:>8.2f}ms  p99 {summary['p99_ms']:>8.2f}ms  "
+        f"{summary['rest_per_op']:>6.2f} REST/op  {checks}"
+    )
+    print(f"{'':<28} REST calls: {summary['rest_calls']}")
+
+# Print how each result changed against the baseline, returning the number of regressions
+def compare(results: dict, baseline: dict, tolerance: float):
+    regressions = 0
+    print(f"\nCompared with baseline (tolerance {tolerance:.0%}):")
+    for key, summary in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            print(f"{key:<28} (not in baseline)")
+            continue
+        changes = []
+        for field, higher_is_better in compared_fields.items():
+            old, new = previous[field], summary[field]
+            change = (new - old) / old if old else 0.0
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            regressions += worse
+            changes.append(f"{field} {old:g} -> {new:g} ({change:+.0%}){' REGRESSION' if worse else ''}")
+        print(f"{key:<28} " + "; ".join(changes))
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vote, submission & review pipelines against a fake Discord")
+    parser.add_argument("--workloads", type=lambda text: text.split(","), default=list(workloads), help=f"comma-separated, from: {', '.join(workloads)}")
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")], default=[100, 1000, 10000], help="store sizes (number of suggestions), e.g. 100,1000,100000")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), default="json", help="storage backend (as STORAGE_MODE in main.py)")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated REST latency in seconds")
+    parser.add_argument("--voters", type=int, default=1000, help="reaction_storm: users voting on the hot suggestion")
+    parser.add_argument("--switch-rate", type=float, default=0.2, help="reaction_storm: share of voters who switch sides")
+    parser.add_argument("--submissions", type=int, default=200, help="concurrent_submits: modals submitted at once")
+    parser.add_argument("--reviews", type=int, default=500, help="bulk_approvals: suggestions approved")
+    parser.add_argument("--save-baseline", metavar="FILE", help="write the results to FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with FILE")
+    parser.add_argument("--tolerance", type=float, default=default_tolerance, help="relative change that counts as a regression")
+    args = parser.parse_args(argv)
+    unknown = set(args.workloads) - set(workloads)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run_benchmarks(args))
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+# This code runs only if the file is executed directly (python -m benchmarks.run)
+if __name__ == "__main__":
+    raise SystemExit(main())
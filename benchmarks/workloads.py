@@ -0,0 +1,291 @@
+# Overview
+# - Builds a benchmark environment: a synthetic store of N suggestions on disk, the fake Discord layer & the real cogs
+#   (Events, Suggestions, AdminControls) wired up the same way main.py does it
+# - Contains the workloads that are replayed against it; each returns a WorkloadResult with per-operation latencies,
+#   REST calls made and a correctness check
+
+# Libraries to import
+import asyncio
+import json
+import random
+import time
+from utils.votes import VoteSet, TICK, CROSS, encode_votes
+from utils.suggestion_management import SuggestionStore
+from utils.sqlite_store import SQLiteSuggestionStore, migrate_json
+from utils.similarity import SimilarityIndex
+from utils.language import LanguageClassifier
+from utils.analytics import SuggestionAnalytics
+from utils.search import SearchIndex
+from utils.archive import SuggestionArchive
+from utils.guilds import GuildConfig, GuildPartition, GuildPartitions, emoji_id
+from cogs.suggestions import Suggestions, PanelManager
+from cogs.events import Events
+from cogs.admin_controls import AdminControls, bulk_review_limit
+from benchmarks.fake_discord import FakeREST, FakeBot, FakeUser, FakeEmoji, FakeReactionPayload, FakeInteraction
+
+# Words used to make up suggestion text
+vocabulary = (
+    "add more channels events tournaments roles emojis weekly monthly voice text clips highlights coaching "
+    "scrims leaderboard rewards giveaways streams schedule rules moderation bots music art fan community"
+).split()
+
+# Latencies & REST calls of one workload run
+class WorkloadResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []     # Seconds per operation
+        self.seconds = 0.0      # Wall time of the whole run
+        self.rest_calls = {}    # Call type -> count
+        self.checks = {}        # Name -> value (e.g. {"lost_votes": 0})
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        ops = len(latencies)
+        rest_total = sum(self.rest_calls.values())
+        return {
+            "ops": ops,
+            "seconds": round(self.seconds, 4),
+            "throughput": round(ops / self.seconds, 2) if self.seconds else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "rest_per_op": round(rest_total / ops, 3) if ops else 0.0,
+            "rest_calls": dict(sorted(self.rest_calls.items())),
+            "checks": self.checks
+        }
+
+# Percentile of an already-sorted list (nearest rank)
+def percentile(values, q: float):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * len(values)) - 1))]
+
+# Make a synthetic suggestions.json with `size` pending suggestions (each with a few votes)
+def make_data(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    suggestions = []
+    for suggestion_id in range(1, size + 1):
+        votes = VoteSet()
+        for voter in rng.sample(range(1, 5000), rng.randint(0, 8)):
+            votes.add(voter, rng.choice(("tick", "cross")))
+        suggestions.append({
+            "id": suggestion_id,
+            "message_id": 10 ** 17 + suggestion_id,
+            "author_id": rng.randint(1, 5000),
+            "content": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 20))),
+            "votes": votes,
+            "status": "pending",
+            "staff_response": None,
+            "language": "en"
+        })
+    return {"last_id": size, "panel_id": None, "suggestions": suggestions}
+
+# Everything a workload needs: the fake bot, the real store & cogs
+class Environment:
+    def __init__(self, directory: str, size: int, storage: str = "json", latency: float = 0.05):
+        self.directory = directory
+        self.size = size
+        self.storage = storage
+        self.rest = FakeREST(latency)
+        self.bot = FakeBot(self.rest)
+        # One guild (the built-in settings) with its data in the benchmark's directory
+        self.config = GuildConfig(data_dir=directory)
+        self.channel_id = self.config.suggestions_channel
+        self.tick = FakeEmoji("Tick", emoji_id(self.config.tick_emoji))
+        self.cross = FakeEmoji("Cross", emoji_id(self.config.cross_emoji))
+        self.partition = None
+        self.admin_user = FakeUser(1, "admin")
+
+    # Write the synthetic data, start the store & load the cogs
+    async def start(self):
+        bot = self.bot
+        config = self.config
+        json_path = config.path("suggestions.json")
+        text = json.dumps(make_data(self.size), indent=4, default=encode_votes)
+        with open(json_path, "w") as f:
+            f.write(text)
+        archive = SuggestionArchive(config.path("archive.gz"), config.path("archive.index"))
+        if self.storage == "sqlite":
+            db_path = config.path("suggestions.db")
+            await migrate_json(json_path, db_path)
+            store = SQLiteSuggestionStore(db_path=db_path, archive=archive)
+        else:
+            store = SuggestionStore(path=json_path, journal=self.storage == "journal", journal_path=config.path("suggestions.journal"), archive=archive)
+
+        # The guild's partition & shared services, loaded as in main.py (short panel window so reposts happen within a run)
+        # The synthetic suggestions are already tagged with a language, so the language backfill has nothing to do
+        self.partition = partition = GuildPartition(
+            config, store, SimilarityIndex(config.path("similarity.npz")), SuggestionAnalytics(store, config.path("analytics.json")),
+            SearchIndex(store), LanguageClassifier(store)
+        )
+        partition.panel = PanelManager(bot, partition, quiet_window=0.05)
+        await partition.start()
+        bot.partitions = GuildPartitions([partition])
+        bot.add_emoji(self.tick)
+        bot.add_emoji(self.cross)
+
+        self.events = Events(bot)
+        await self.events.cog_load()
+        bot.on_reaction_remove(self.events.on_raw_reaction_remove)
+        self.suggestions = Suggestions(bot)
+        self.admin = AdminControls(bot)
+
+    # Wait for background work (reaction removals, the events they cause, panel reposts) to finish:
+    # done once no REST call has been made for longer than any of them waits before starting
+    async def settle(self):
+        quiet = self.events.removals.delay + self.partition.panel.quiet_window + 3 * self.rest.latency + 0.05
+        while True:
+            calls = self.rest.total()
+            await asyncio.sleep(quiet)
+            await self.bot.drain()
+            if self.rest.total() == calls:
+                return
+
+    async def stop(self):
+        await self.events.cog_unload()
+        await self.partition.close()
+
+    # Run a workload coroutine, timing it and recording the REST calls made (including background work it caused)
+    async def measure(self, result: WorkloadResult, workload):
+        before = dict(self.rest.calls)
+        started = time.perf_counter()
+        await workload
+        result.seconds = time.perf_counter() - started
+        await self.settle()
+        result.rest_calls = {kind: count - before.get(kind, 0) for kind, count in self.rest.calls.items() if count - before.get(kind, 0)}
+        return result
+
+# Time one awaited operation
+async def timed_op(result: WorkloadResult, operation):
+    started = time.perf_counter()
+    await operation
+    result.latencies.append(time.perf_counter() - started)
+
+# --- Workloads ---
+
+# Many users voting at once on one hot suggestion; some of them then switch sides
+# Checks that every user ends up with exactly the vote they last cast
+async def reaction_storm(env: Environment, voters: int = 1000, switch_rate: float = 0.2, seed: int = 0):
+    result = WorkloadResult("reaction_storm")
+    rng = random.Random(seed)
+    hot = env.partition.store.with_status("pending")[-1]
+    message = env.bot.get_channel(env.channel_id).get_partial_message(hot["message_id"])
+    expected = {}   # User ID -> final choice
+
+    # One user reacting (the reaction is added on "Discord" first, then the gateway event arrives)
+    async def react(user_id: int, emoji: FakeEmoji):
+        message.reactions.setdefault(str(emoji), set()).add(user_id)
+        payload = FakeReactionPayload(env.channel_id, hot["message_id"], user_id, emoji)
+        await timed_op(result, env.events.on_raw_reaction_add(payload))
+
+    async def voter(user_id: int):
+        await react(user_id, env.tick)
+        expected[user_id] = "tick"
+        if rng.random() < switch_rate:
+            await react(user_id, env.cross)
+            expected[user_id] = "cross"
+
+    user_ids = range(10 ** 6, 10 ** 6 + voters)
+    await env.measure(result, asyncio.gather(*(voter(user_id) for user_id in user_ids)))
+    votes = hot["votes"]
+    result.checks["lost_votes"] = sum(1 for user_id, choice in expected.items() if votes.choice_of(user_id) != choice)
+    return result
+
+# Voters spread over several hot suggestions while an admin approves half of them mid-storm
+# Checks that no vote on a still-pending suggestion is lost and that no vote lands on a suggestion after it was closed
+async def storm_with_reviews(env: Environment, voters: int = 1000, switch_rate: float = 0.2, hot: int = 10, seed: int = 0):
+    result = WorkloadResult("storm_with_reviews")
+    rng = random.Random(seed)
+    store = env.partition.store
+    targets = store.with_status("pending")[-hot:]
+    to_approve = targets[::2]
+    spread = 20 * env.rest.latency + 0.05     # Seconds over which votes (and the approvals) arrive
+    expected = {}           # (suggestion ID, user ID) -> final choice
+    closed_counts = {}      # Suggestion ID -> number of votes when it was closed
+
+    def on_change(record: dict):
+        if record["op"] == "status":
+            votes = store.get(record["id"])["votes"]
+            closed_counts[record["id"]] = votes.count(TICK) + votes.count(CROSS)
+
+    store.add_listener(on_change)
+
+    async def react(suggestion: dict, user_id: int, emoji: FakeEmoji):
+        message = env.bot.get_channel(env.channel_id).get_partial_message(suggestion["message_id"])
+        message.reactions.setdefault(str(emoji), set()).add(user_id)
+        payload = FakeReactionPayload(env.channel_id, suggestion["message_id"], user_id, emoji)
+        await timed_op(result, env.events.on_raw_reaction_add(payload))
+
+    async def voter(user_id: int):
+        suggestion = rng.choice(targets)
+        await asyncio.sleep(rng.random() * spread)
+        await react(suggestion, user_id, env.tick)
+        expected[(suggestion["id"], user_id)] = TICK
+        if rng.random() < switch_rate:
+            await react(suggestion, user_id, env.cross)
+            expected[(suggestion["id"], user_id)] = CROSS
+
+    async def approve(suggestion: dict):
+        await asyncio.sleep(spread / 2)
+        interaction = FakeInteraction(env.bot, env.admin_user)
+        await env.admin.approve.callback(env.admin, interaction, suggestion["id"], None)
+
+    user_ids = range(3 * 10 ** 6, 3 * 10 ** 6 + voters)
+    await env.measure(result, asyncio.gather(*(voter(user_id) for user_id in user_ids), *(approve(suggestion) for suggestion in to_approve)))
+    # Closed suggestions may have been moved to the archive by a background flush
+    final = {suggestion["id"]: store.get(suggestion["id"]) or await store.get_archived(suggestion["id"]) for suggestion in targets}
+    result.checks["lost_votes"] = sum(
+        1 for (suggestion_id, user_id), choice in expected.items()
+        if final[suggestion_id]["status"] == "pending" and final[suggestion_id]["votes"].choice_of(user_id) != choice
+    )
+    result.checks["votes_after_close"] = sum(
+        abs(final[suggestion_id]["votes"].count(TICK) + final[suggestion_id]["votes"].count(CROSS) - count)
+        for suggestion_id, count in closed_counts.items()
+    )
+    result.checks["approved"] = len(closed_counts)
+    result.checks["idle_locks"] = len(env.partition.locks)
+    return result
+
+# Many users submitting the suggestion modal at the same time
+# Checks that every submission was stored under its own ID
+async def concurrent_submits(env: Environment, submissions: int = 200, seed: int = 0):
+    result = WorkloadResult("concurrent_submits")
+    rng = random.Random(seed)
+    store = env.partition.store
+    first_id = store.data["last_id"] + 1
+
+    async def submit(user_id: int):
+        interaction = FakeInteraction(env.bot, FakeUser(user_id))
+        modal = Suggestions.SuggestModal(env.bot, env.partition)
+        modal.suggestion_input._refresh_state(interaction, {"value": " ".join(rng.choice(vocabulary) for _ in range(12))})
+        await timed_op(result, modal.on_submit(interaction))
+
+    await env.measure(result, asyncio.gather(*(submit(user_id) for user_id in range(2 * 10 ** 6, 2 * 10 ** 6 + submissions))))
+    stored = [store.get(suggestion_id) for suggestion_id in range(first_id, first_id + submissions)]
+    result.checks["missing_submissions"] = sum(1 for suggestion in stored if suggestion is None)
+    return result
+
+# An admin working through the backlog with /approve_many (bulk_review_limit IDs per command)
+# Checks that every reviewed suggestion ended up approved
+async def bulk_approvals(env: Environment, reviews: int = 500):
+    result = WorkloadResult("bulk_approvals")
+    ids = [suggestion["id"] for suggestion in env.partition.store.with_status("pending")][:reviews]
+    batches = [ids[start:start + bulk_review_limit] for start in range(0, len(ids), bulk_review_limit)]
+
+    async def run():
+        for batch in batches:
+            interaction = FakeInteraction(env.bot, env.admin_user)
+            id_list = ", ".join(str(suggestion_id) for suggestion_id in batch)
+            await timed_op(result, env.admin.approve_many.callback(env.admin, interaction, id_list, None))
+
+    await env.measure(result, run())
+    await env.partition.store.flush()     # Move the approved suggestions to the archive
+    result.checks["not_approved"] = sum(1 for suggestion_id in ids if env.partition.store.archived_status(suggestion_id) != "approved")
+    return result
+
+# Workload name -> (function, settings read from the command line)
+workloads = {
+    "reaction_storm": (reaction_storm, ("voters", "switch_rate")),
+    "storm_with_reviews": (storm_with_reviews, ("voters", "switch_rate")),
+    "concurrent_submits": (concurrent_submits, ("submissions",)),
+    "bulk_approvals": (bulk_approvals, ("reviews",))
+}
@@ -1,6 +1,13 @@
 # Overview for admin_controls.py
 # - Cog for admin commands
 # - Contains slash commands to approve/reject suggestions and view votes for a certain suggestion
+# - Contains bulk slash commands to approve/reject many suggestions at once
+# - /votes lists voters page by page, with next/prev buttons that keep working after a restart
+# - /suggestion_stats & /bot_stats show suggestion analytics & the bot's performance metrics
+# - Closes & flags suggestions for the guilds' auto-close rules (auto_close_sweep, run by utils/auto_close.py)
+# - /export_suggestions streams the guild's suggestions or votes (NDJSON/CSV, optionally gzipped) into a file attachment
+# - The suggestion ID options autocomplete by ID or by words from the suggestion, served from the search index
+# - Every command works on the suggestions of the guild it is used in (its partition, see utils/guilds.py)
 
 # Libraries to import
 import discord
@@ -8,235 +15,577 @@ from discord.ext import commands
 from discord import app_commands
 from discord.utils import get
 import datetime
-from utils.suggestion_management import load_data, save_data, get_panel_id, set_panel_id
-from cogs.suggestions import Suggestions
+import asyncio
+import tempfile
+import logging
+from utils.votes import TICK, CROSS
+from utils.user_cache import mention
+from utils.metrics import metrics, timed
+from utils.guilds import partition_for
+from utils.export import snapshot_live, iter_suggestions, export_chunks, export_filename, write_export
+
+log = logging.getLogger(__name__)
 
 # Universal variables
-suggestions_channel = 1390343546791268507  # TE Server - #suggestions channel
-reviewed_suggestions_channel = 1390343546791268507 # TE Server - #suggestions channel - If this channel is different from suggestions_channel, please review the code in the /approve and /deny slash commands.
-bot_id = 981854054760185927 # The ID of the bot on Discord
-tick_emoji = "<:Tick:1422628423620366469>" # emoji from TE Discord
-cross_emoji = "<:Cross:1422628421913149440>" # emoji from TE Discord
+bulk_review_concurrency = 5 # Max Discord requests in flight at once during /approve_many & /reject_many
+bulk_review_limit = 50 # Max suggestions per /approve_many or /reject_many
+votes_page_size = 25 # Voters listed per side on each /votes page
+stats_top_size = 5 # Suggestions & authors listed in each /suggestion_stats ranking
+stats_days = 7 # Days of activity shown by /suggestion_stats
+autocomplete_size = 25 # Choices offered by the suggestion ID autocomplete (Discord's maximum)
+default_upload_limit = 8 * 1024 * 1024 # Bytes an attachment can have if the guild's limit is unknown
+
+# Wording & colour of the embed posted when a suggestion is reviewed
+review_styles = {
+    "approved": ("The suggestion below is now closed for voting and has been **approved** by staff!", "Approved by", 0x00FF00),
+    "rejected": ("The suggestion below is now closed for voting and has been **rejected** by staff.", "Rejected by", 0xFF0000)
+}
+
+# Build the embed that is posted when a suggestion is approved/rejected
+def review_embed(bot, config, suggestion: dict, status: str, author_mention: str, reviewer_mention: str, reason: str = None):
+    heading, reviewed_by, color = review_styles[status]
+    embed_description = (
+        f"{heading}\n\n"
+        f"**Suggestion:** {suggestion['content']}\n\n"
+        f"**Suggested by:** {author_mention}\n\n"
+        f"**Voting results:**\n{config.tick_emoji}: {suggestion['votes'].count(TICK)}\n"
+        f"{config.cross_emoji}: {suggestion['votes'].count(CROSS)}\n\n"
+        f"**{reviewed_by}:** {reviewer_mention}"
+    )
+    if reason:
+        embed_description += f"\n\n**Staff Response:**\n{reason}"
+
+    embed = discord.Embed(description=embed_description, timestamp=datetime.datetime.utcnow(), color=color)
+    embed.set_footer(text=f"{bot.user.display_name} • Suggestion ID: {suggestion['id']}")
+    return embed
+
+# Turn a list of IDs like "3, 5, 10-14" into a list of ints (in the order given, without repeats)
+def parse_id_list(text: str):
+    ids = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+            if end - start >= bulk_review_limit:
+                raise ValueError(f"range {part} is too long")
+            ids.extend(range(start, end + 1))
+        else:
+            ids.append(int(part))
+    return list(dict.fromkeys(ids))
+
+# Autocomplete choices for a suggestion ID option: IDs starting with the digits typed so far, or the best matches
+# for the words typed so far (only the search index is read, as this runs on every keystroke)
+def suggestion_choices(interaction: discord.Interaction, current: str, pending_only: bool):
+    partition = interaction.client.partitions.for_guild(interaction.guild_id)
+    if partition is None or not partition.ready.is_set():
+        return []
+    search = partition.search
+    text = current.strip().lstrip("#")
+    if not text or text.isdigit():
+        ids = search.ids_with_prefix(text, pending_only, autocomplete_size)
+    else:
+        ids = [suggestion_id for suggestion_id, _ in search.search(text, "pending" if pending_only else None, autocomplete_size, prefix=True)]
+    choices = []
+    for suggestion_id in ids:
+        label = f"{suggestion_id} • {search.snippet(suggestion_id)}" if pending_only else f"{suggestion_id} ({search.status_of(suggestion_id)}) • {search.snippet(suggestion_id)}"
+        choices.append(app_commands.Choice(name=label[:100], value=str(suggestion_id)))
+    return choices
+
+# Suggestion ID option that can be filled in by typing an ID or some words from the suggestion
+# Discord's integer options only accept digits, so the option is sent as text and turned back into an ID here;
+# text that isn't an ID becomes 0, which matches no suggestion, so commands answer with "not a valid Suggestion ID"
+class SuggestionID(app_commands.Transformer):
+    def __init__(self, pending_only: bool):
+        self.pending_only = pending_only
+
+    @property
+    def type(self):
+        return discord.AppCommandOptionType.string
+
+    async def transform(self, interaction: discord.Interaction, value: str):
+        value = value.strip().lstrip("#")
+        return int(value) if value.isdigit() else 0
+
+    async def autocomplete(self, interaction: discord.Interaction, value: str):
+        return suggestion_choices(interaction, value, self.pending_only)
+
+# Option types for /approve & /reject (pending suggestions) and /votes (any suggestion)
+PendingSuggestionID = app_commands.Transform[int, SuggestionID(pending_only=True)]
+AnySuggestionID = app_commands.Transform[int, SuggestionID(pending_only=False)]
+
+# Close pending suggestions (their locks are held by the caller), returning a result line per suggestion ID
+# Messages are fetched concurrently, every status is persisted in a single write, the result embeds are posted in order
+# and the panel is reposted once for the whole batch
+async def close_batch(bot, partition, suggestions, status: str, reviewer_mention: str, reason: str = None):
+    store = partition.store
+    results = {}
+
+    # Fetch suggestion messages concurrently (at most bulk_review_concurrency requests at a time)
+    # Authors are only mentioned, so they need no lookup
+    channel = bot.get_channel(partition.config.suggestions_channel)
+    limit = asyncio.Semaphore(bulk_review_concurrency)
+
+    async def fetch(suggestion):
+        async with limit:
+            return await channel.fetch_message(suggestion["message_id"])
+
+    fetched = await asyncio.gather(*(fetch(suggestion) for suggestion in suggestions), return_exceptions=True)
+    ready = []
+    for suggestion, result in zip(suggestions, fetched):
+        if isinstance(result, Exception):
+            results[suggestion["id"]] = "❌ could not fetch the suggestion message"
+        else:
+            ready.append((suggestion, result))
+
+    # Update every status, then persist them all in a single write
+    for suggestion, message in ready:
+        store.set_status(suggestion, status, reason)
+    await store.flush()
+
+    # Post the result embeds (in ID order) and remove the original suggestions
+    reviewed_channel = bot.get_channel(partition.config.reviewed_channel)
+    for suggestion, message in ready:
+        embed = review_embed(bot, partition.config, suggestion, status, mention(suggestion["author_id"]), reviewer_mention, reason)
+        try:
+            await reviewed_channel.send(embed=embed)
+            await message.delete() # removes the original suggestion
+            results[suggestion["id"]] = f"✅ {status}"
+        except discord.HTTPException:
+            results[suggestion["id"]] = f"⚠️ {status}, but posting the result failed"
+
+    # Move the suggestion panel back to the bottom of the channel (once for the whole batch)
+    if ready:
+        partition.panel.request_repost()
+    return results
+
+# Sweep callback of a guild's AutoCloseScheduler (utils/auto_close.py): close the suggestions whose deadline has passed
+# and post one message listing the newly flagged ones; returns the IDs that could not be closed (retried later)
+async def auto_close_sweep(bot, partition, due_ids, flagged_ids):
+    await bot.wait_until_ready()
+    config = partition.config
+    store = partition.store
+    retry = []
+    if due_ids:
+        # Hold the locks so votes and staff reviews of these suggestions wait; any closed meanwhile are skipped
+        async with partition.locks.many(due_ids):
+            due = [suggestion for suggestion in map(store.get, due_ids) if suggestion is not None and suggestion["status"] == "pending"]
+            reason = f"Automatically {config.auto_close_status} after {config.auto_close_days:g} days without a review."
+            results = await close_batch(bot, partition, due, config.auto_close_status, bot.user.mention, reason)
+            retry = [suggestion["id"] for suggestion in due if suggestion["status"] == "pending"]
+        log.info("[AUTO-CLOSE] Closed %d suggestions (%d to retry)", len(due) - len(retry), len(retry))
+        for suggestion_id in retry:
+            log.warning("[AUTO-CLOSE] Suggestion %s: %s", suggestion_id, results[suggestion_id])
+
+    flagged = [suggestion for suggestion in map(store.get, flagged_ids) if suggestion is not None and suggestion["status"] == "pending"]
+    if flagged:
+        lines = []
+        for suggestion in flagged:
+            net_votes = partition.auto_close.net_votes(suggestion)
+            content = suggestion["content"]
+            lines.append(f"**{suggestion['id']}** ({net_votes:+d}): {content[:80]}{'…' if len(content) > 80 else ''}")
+        embed = discord.Embed(
+            title="Suggestions ready for review",
+            description=f"These suggestions have reached {config.review_threshold:+d} net votes. Use /approve or /reject to close them.\n\n" + "\n".join(lines),
+            timestamp=datetime.datetime.utcnow(),
+            color=0xFFA500
+        )
+        await bot.get_channel(config.flag_channel).send(embed=embed)
+        # Keep the panel at the bottom if the flags went to the suggestions channel (no-op if close_batch already asked)
+        if config.flag_channel == config.suggestions_channel:
+            partition.panel.request_repost()
+    return retry
 
 # Admin controls cog
 class AdminControls(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # Let /votes page buttons from before a restart keep working
+        self.bot.add_dynamic_items(VotesPageButton)
+
     # Slash command for admins to approve suggestions
     @app_commands.command(name="approve", description="Approve and finalise a suggestion")
     @app_commands.checks.has_permissions(manage_guild=True)
-    @app_commands.describe(suggestion_id="The ID of the suggestion to approve", reason="Optional staff response")
-    async def approve(self, interaction: discord.Interaction, suggestion_id: int, reason: str = None):
-        data = load_data()
-        # If suggestion_id comes from user input (string)
-        int_suggestion_id = int(suggestion_id)
-        # Load all suggestions from JSON
-        data = load_data()
-
-        # Initialize suggestion variable
-        suggestion = None
-
-        # Loop through each suggestion in the list
-        for s in data["suggestions"]:
-            # s is a single suggestion dictionary
-            if s["id"] == int_suggestion_id:
-                suggestion = s  # Found the suggestion
-                break  # Stop looping once found
-
-        # Check if we found it
-        if suggestion is None:
-            await interaction.response.send_message(
-                f"{interaction.user.mention}, this is not a valid Suggestion ID.",
-                ephemeral=True
-            )
-        else:
-            # suggestion now contains the dictionary of the matching suggestion
-            # You can continue with approval logic here
-            print("Found suggestion:", suggestion)
-
-        # Suggestion ID not found
-        if not suggestion:
-            await interaction.response.send_message(f"{interaction.user.mention}, this is not a valid Suggestion ID.", ephemeral=True)
+    @app_commands.describe(suggestion_id="The ID of the suggestion to approve (or type words from it)", reason="Optional staff response")
+    @timed("command:/approve")
+    async def approve(self, interaction: discord.Interaction, suggestion_id: PendingSuggestionID, reason: str = None):
+        partition = await partition_for(interaction)
+        if not partition:
             return
-
-        # Update suggestion status and staff response if given
-        suggestion["status"] = "approved"
-        if reason:
-            suggestion["staff_response"] = reason
-        save_data(data)
-
-        # Get suggestion
-        channel = self.bot.get_channel(suggestions_channel)
-        suggestion_message = await channel.fetch_message(suggestion['message_id'])
-
-        # Get author of the suggestion
-        author = await self.bot.fetch_user(suggestion['author_id'])
-
-        # Discord Embed that posts when suggestion is accepted
-        embed_description = (
-            f"The suggestion below is now closed for voting and has been **approved** by staff!\n\n"
-            f"**Suggestion:** {suggestion['content']}\n\n"
-            f"**Suggested by:** {author.mention}\n\n"
-            f"**Voting results:**\n{tick_emoji}: {len(suggestion['votes'][tick_emoji])}\n"
-            f"{cross_emoji}: {len(suggestion['votes'][cross_emoji])}\n\n"
-            f"**Approved by:** {interaction.user.mention}"
-        )
-        if reason:
-            embed_description += f"\n\n**Staff Response:**\n{reason}"
-
-        embed = discord.Embed(description=embed_description, timestamp=datetime.datetime.utcnow(), color=0x00FF00)
-        embed.set_footer(text=f"{self.bot.user.display_name} • Suggestion ID: {suggestion_id}")
-
-        # Get current suggestion panel
-        panel_id = get_panel_id()
-        if panel_id:
-            try:
-                suggestion_panel = await channel.fetch_message(panel_id)
-                await suggestion_panel.delete()  # Remove old panel before posting new
-            except:
-                pass
-
-        # Post embed to reviewed suggestions channel
-        reviewed_channel = self.bot.get_channel(reviewed_suggestions_channel)
-        await reviewed_channel.send(embed=embed)
-
-        # Makes a new suggestion panel
-        panel_embed = discord.Embed(
-            description=f"**Make a Suggestion**\n\nIf you have something you would like to suggest relating to TLOU Esports, feel free to press the button below and type in your suggestion on the pop-up screen that follows.",
-            color=0x00FF00
-            )
-        new_panel = await channel.send(f"```yaml\n\nWelcome to Suggestions!\n\n```\n• Before making a suggestion, be sure to check the messages __above__ this one to see suggestions that other members have posted.\n\n• Use the {tick_emoji}/{cross_emoji} reaction buttons to cast your votes! This will help us in the decision-making process when we come to review the community's suggestions.\n\n• It's also a good idea to check {reviewed_channel.mention} to view suggestions that have already been approved/rejected by staff.\n\n*Please avoid duplicating any suggestion that has been previously made within a short space of time & try to stick to one suggestion per use, as this will streamline the voting & reviewal processes. Any message that has not been made using the bot is automatically removed from this channel. Usual server rules apply.*", embed=panel_embed, view=Suggestions.SuggestionsPanelButton(self.bot))
-        set_panel_id(new_panel.id)
-
-        await suggestion_message.delete() # removes the original suggestion
-        await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} approved!", ephemeral=True)
+        store = partition.store
+        # Hold the suggestion's lock until it is closed, so votes on it and other reviews of it wait
+        async with partition.locks(int(suggestion_id)):
+            # Find the suggestion in the store
+            suggestion = store.get(int(suggestion_id))
+
+            # Suggestion ID not found (reviewed suggestions are moved to the archive)
+            if not suggestion:
+                archived_status = store.archived_status(int(suggestion_id))
+                if archived_status:
+                    await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} has already been {archived_status}.", ephemeral=True)
+                else:
+                    await interaction.response.send_message(f"{interaction.user.mention}, this is not a valid Suggestion ID.", ephemeral=True)
+                return
+
+            # Already reviewed (e.g. by another admin a moment ago)
+            if suggestion["status"] != "pending":
+                await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} has already been {suggestion['status']}.", ephemeral=True)
+                return
+
+            # Update suggestion status and staff response if given
+            store.set_status(suggestion, "approved", reason)
+
+            # Get suggestion
+            channel = self.bot.get_channel(partition.config.suggestions_channel)
+            suggestion_message = await channel.fetch_message(suggestion['message_id'])
+
+            # Mention the author of the suggestion (built from the ID, no lookup needed)
+            author_mention = mention(suggestion['author_id'])
+
+            # Discord Embed that posts when suggestion is accepted
+            embed = review_embed(self.bot, partition.config, suggestion, "approved", author_mention, interaction.user.mention, reason)
+
+            # Post embed to reviewed suggestions channel
+            reviewed_channel = self.bot.get_channel(partition.config.reviewed_channel)
+            await reviewed_channel.send(embed=embed)
+
+            await suggestion_message.delete() # removes the original suggestion
+            # Move the suggestion panel back to the bottom of the channel
+            partition.panel.request_repost()
+            await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} approved!", ephemeral=True)
 
     # ---
 
     # Slash command for admins to reject suggestions
     @app_commands.command(name="reject", description="Reject and finalise a suggestion")
     @app_commands.checks.has_permissions(manage_guild=True)
-    @app_commands.describe(suggestion_id="The ID of the suggestion to reject", reason="Optional staff response")
-    async def reject(self, interaction: discord.Interaction, suggestion_id: int, reason: str = None):
-        data = load_data()
-        # If suggestion_id comes from user input (string)
-        int_suggestion_id = int(suggestion_id)
-        # Load all suggestions from JSON
-        data = load_data()
-
-        # Initialize suggestion variable
-        suggestion = None
-
-        # Loop through each suggestion in the list
-        for s in data["suggestions"]:
-            # s is a single suggestion dictionary
-            if s["id"] == int_suggestion_id:
-                suggestion = s  # Found the suggestion
-                break  # Stop looping once found
-
-        # Check if we found it
-        if suggestion is None:
-            await interaction.response.send_message(
-                f"{interaction.user.mention}, this is not a valid Suggestion ID.",
-                ephemeral=True
-            )
-        else:
-            # suggestion now contains the dictionary of the matching suggestion
-            # You can continue with approval logic here
-            print("Found suggestion:", suggestion)
-
-        # Suggestion ID not found
-        if not suggestion:
-            await interaction.response.send_message(f"{interaction.user.mention}, this is not a valid Suggestion ID.", ephemeral=True)
+    @app_commands.describe(suggestion_id="The ID of the suggestion to reject (or type words from it)", reason="Optional staff response")
+    @timed("command:/reject")
+    async def reject(self, interaction: discord.Interaction, suggestion_id: PendingSuggestionID, reason: str = None):
+        partition = await partition_for(interaction)
+        if not partition:
             return
+        store = partition.store
+        # Hold the suggestion's lock until it is closed, so votes on it and other reviews of it wait
+        async with partition.locks(int(suggestion_id)):
+            # Find the suggestion in the store
+            suggestion = store.get(int(suggestion_id))
+
+            # Suggestion ID not found (reviewed suggestions are moved to the archive)
+            if not suggestion:
+                archived_status = store.archived_status(int(suggestion_id))
+                if archived_status:
+                    await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} has already been {archived_status}.", ephemeral=True)
+                else:
+                    await interaction.response.send_message(f"{interaction.user.mention}, this is not a valid Suggestion ID.", ephemeral=True)
+                return
+
+            # Already reviewed (e.g. by another admin a moment ago)
+            if suggestion["status"] != "pending":
+                await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} has already been {suggestion['status']}.", ephemeral=True)
+                return
+
+            # Update suggestion status and staff response if given
+            store.set_status(suggestion, "rejected", reason)
+
+            # Get original suggestion message
+            channel = self.bot.get_channel(partition.config.suggestions_channel)
+            suggestion_message = await channel.fetch_message(suggestion['message_id'])
+
+            # Mention the author of the suggestion (built from the ID, no lookup needed)
+            author_mention = mention(suggestion['author_id'])
+
+            # Discord Embed that posts when suggestion is denied
+            embed = review_embed(self.bot, partition.config, suggestion, "rejected", author_mention, interaction.user.mention, reason)
+
+            # Post embed to reviewed suggestions channel
+            reviewed_channel = self.bot.get_channel(partition.config.reviewed_channel)
+            await reviewed_channel.send(embed=embed)
+
+            await suggestion_message.delete() # removes the original suggestion
+            # Move the suggestion panel back to the bottom of the channel
+            partition.panel.request_repost()
+            await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} rejected!", ephemeral=True)
 
-        # Update suggestion status and staff response if given
-        suggestion["status"] = "rejected"
-        if reason:
-            suggestion["staff_response"] = reason
-        save_data(data)
-
-        # Get original suggestion message
-        channel = self.bot.get_channel(suggestions_channel)
-        suggestion_message = await channel.fetch_message(suggestion['message_id'])
-
-        # Get author of the suggestion
-        author = await self.bot.fetch_user(suggestion['author_id'])
-
-        # Discord Embed that posts when suggestion is denied
-        embed_description = (
-            f"The suggestion below is now closed for voting and has been **rejected** by staff.\n\n"
-            f"**Suggestion:** {suggestion['content']}\n\n"
-            f"**Suggested by:** {author.mention}\n\n"
-            f"**Voting results:**\n{tick_emoji}: {len(suggestion['votes'][tick_emoji])}\n"
-            f"{cross_emoji}: {len(suggestion['votes'][cross_emoji])}\n\n"
-            f"**Rejected by:** {interaction.user.mention}"
-        )
-        if reason:
-            embed_description += f"\n\n**Staff Response:**\n{reason}"
-
-        embed = discord.Embed(description=embed_description, timestamp=datetime.datetime.utcnow(), color=0xFF0000)
-        embed.set_footer(text=f"{self.bot.user.display_name} • Suggestion ID: {suggestion_id}")
-
-        # Get current suggestion panel
-        panel_id = get_panel_id()
-        if panel_id:
-            try:
-                suggestion_panel = await channel.fetch_message(panel_id)
-                await suggestion_panel.delete()  # Remove old panel before posting new
-            except:
-                pass
-
-        # Post embed to reviewed suggestions channel
-        reviewed_channel = self.bot.get_channel(reviewed_suggestions_channel)
-        await reviewed_channel.send(embed=embed)
-
-        # Makes a new suggestion panel
-        panel_embed = discord.Embed(
-            description=f"**Make a Suggestion**\n\nIf you have something you would like to suggest relating to TLOU Esports, feel free to press the button below and type in your suggestion on the pop-up screen that follows.",
-            color=0x00FF00
-            )
-        new_panel = await channel.send(f"```yaml\n\nWelcome to Suggestions!\n\n```\n• Before making a suggestion, be sure to check the messages __above__ this one to see suggestions that other members have posted.\n\n• Use the {tick_emoji}/{cross_emoji} reaction buttons to cast your votes! This will help us in the decision-making process when we come to review the community's suggestions.\n\n• It's also a good idea to check {reviewed_channel.mention} to view suggestions that have already been approved/rejected by staff.\n\n*Please avoid duplicating any suggestion that has been previously made within a short space of time & try to stick to one suggestion per use, as this will streamline the voting & reviewal processes. Any message that has not been made using the bot is automatically removed from this channel. Usual server rules apply.*", embed=panel_embed, view=Suggestions.SuggestionsPanelButton(self.bot))
-        set_panel_id(new_panel.id)
+    # ---
+
+    # Slash command for admins to approve many suggestions at once
+    @app_commands.command(name="approve_many", description="Approve and finalise several suggestions at once")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.describe(suggestion_ids="Suggestion IDs, e.g. 3, 5, 10-14", reason="Optional staff response (used for all of them)")
+    @timed("command:/approve_many")
+    async def approve_many(self, interaction: discord.Interaction, suggestion_ids: str, reason: str = None):
+        await self.review_many(interaction, suggestion_ids, "approved", reason)
 
-        await suggestion_message.delete() # removes the original suggestion
-        await interaction.response.send_message(f"{interaction.user.mention}, suggestion {suggestion_id} rejected!", ephemeral=True)
+    # Slash command for admins to reject many suggestions at once
+    @app_commands.command(name="reject_many", description="Reject and finalise several suggestions at once")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.describe(suggestion_ids="Suggestion IDs, e.g. 3, 5, 10-14", reason="Optional staff response (used for all of them)")
+    @timed("command:/reject_many")
+    async def reject_many(self, interaction: discord.Interaction, suggestion_ids: str, reason: str = None):
+        await self.review_many(interaction, suggestion_ids, "rejected", reason)
+
+    # Approve/reject a batch of suggestions:
+    # fetch messages concurrently, save every status change in one write, post the results & move the panel once
+    async def review_many(self, interaction: discord.Interaction, suggestion_ids: str, status: str, reason: str = None):
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        try:
+            ids = parse_id_list(suggestion_ids)
+        except ValueError:
+            await interaction.response.send_message(f"{interaction.user.mention}, please give the IDs like `3, 5, 10-14` (at most {bulk_review_limit}).", ephemeral=True)
+            return
+        if not ids or len(ids) > bulk_review_limit:
+            await interaction.response.send_message(f"{interaction.user.mention}, please give between 1 and {bulk_review_limit} suggestion IDs.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        # Hold the lock of every listed suggestion until the batch is done, so votes on them and other reviews wait
+        async with partition.locks.many(ids):
+            await self.review_batch(interaction, partition, ids, status, reason)
+
+    # Review the listed suggestions (their locks are held by review_many)
+    async def review_batch(self, interaction: discord.Interaction, partition, ids, status: str, reason: str = None):
+        store = partition.store
+        # Work out which IDs can be reviewed
+        results = {}    # Suggestion ID -> result line for the summary
+        to_review = []
+        for suggestion_id in ids:
+            suggestion = store.get(suggestion_id)
+            if suggestion is None:
+                archived_status = store.archived_status(suggestion_id)
+                results[suggestion_id] = f"❌ already {archived_status}" if archived_status else "❌ not a valid Suggestion ID"
+            elif suggestion["status"] != "pending":
+                results[suggestion_id] = f"❌ already {suggestion['status']}"
+            else:
+                to_review.append(suggestion)
+        results.update(await close_batch(self.bot, partition, to_review, status, interaction.user.mention, reason))
+
+        summary = "\n".join(f"**{suggestion_id}:** {results[suggestion_id]}" for suggestion_id in ids)
+        await interaction.followup.send(f"{interaction.user.mention}, here is the summary:\n{summary}", ephemeral=True)
 
 # ---
 
     # Slash command for admins to view the votes of a given suggestion
     @app_commands.command(name="votes", description="View the votes & see usernames of who voted for a suggestion")
     @app_commands.checks.has_permissions(manage_guild=True)
-    @app_commands.describe(suggestion_id="The ID of the suggestion to view votes for")
-    async def votes(self, interaction: discord.Interaction, suggestion_id: int):
-        data = load_data()
-        suggestion = next((s for s in data["suggestions"] if s["id"] == suggestion_id), None)
+    @app_commands.describe(suggestion_id="The ID of the suggestion to view votes for (or type words from it)")
+    @timed("command:/votes")
+    async def votes(self, interaction: discord.Interaction, suggestion_id: AnySuggestionID):
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        # Reviewed suggestions are read back from the archive
+        suggestion = partition.store.get(suggestion_id) or await partition.store.get_archived(suggestion_id)
 
         # Suggestion ID not found
         if not suggestion:
             await interaction.response.send_message(f"{interaction.user.mention}, this is not a valid Suggestion ID.", ephemeral=True)
             return
 
-        # Display votes
-        tick_users = "\n".join([f"<@{uid}>" for uid in suggestion["votes"][tick_emoji]]) or "No votes"
-        cross_users = "\n".join([f"<@{uid}>" for uid in suggestion["votes"][cross_emoji]]) or "No votes"
+        # Display the first page of votes
+        embed, view = votes_page(self.bot, partition.config, suggestion, 0, interaction.user.mention)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+    # Slash command for admins to export suggestions or votes as a file
+    # The export is streamed from the archive into a temporary file in a worker thread, so memory use doesn't grow with the history
+    @app_commands.command(name="export_suggestions", description="Export suggestions or votes as an NDJSON or CSV file")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.describe(
+        rows="One row per suggestion, or one row per vote",
+        file_format="NDJSON (one JSON object per line) or CSV",
+        status="Only export suggestions with this status",
+        min_id="Lowest suggestion ID to export",
+        max_id="Highest suggestion ID to export",
+        compress="Compress the file with gzip"
+    )
+    @app_commands.rename(file_format="format")
+    @app_commands.choices(
+        rows=[app_commands.Choice(name="Suggestions", value="suggestions"), app_commands.Choice(name="Votes", value="votes")],
+        file_format=[app_commands.Choice(name="NDJSON", value="ndjson"), app_commands.Choice(name="CSV", value="csv")],
+        status=[
+            app_commands.Choice(name="Pending", value="pending"),
+            app_commands.Choice(name="Approved", value="approved"),
+            app_commands.Choice(name="Rejected", value="rejected")
+        ]
+    )
+    @timed("command:/export_suggestions")
+    async def export_suggestions(self, interaction: discord.Interaction, rows: app_commands.Choice[str], file_format: app_commands.Choice[str],
+                                 status: app_commands.Choice[str] = None, min_id: app_commands.Range[int, 1] = None,
+                                 max_id: app_commands.Range[int, 1] = None, compress: bool = False):
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        await interaction.response.defer(ephemeral=True)
+        # The working set is copied here on the event loop; the archive is read by the worker thread
+        live = snapshot_live(partition.store)
+        suggestions = iter_suggestions(live, partition.store.archive, status.value if status else None, min_id, max_id)
+        chunks = export_chunks(suggestions, rows.value, file_format.value, compress)
+        f = tempfile.TemporaryFile()
+        try:
+            size = await asyncio.to_thread(write_export, f, chunks)
+            limit = interaction.guild.filesize_limit if interaction.guild else default_upload_limit
+            if size > limit:
+                await interaction.followup.send(
+                    f"{interaction.user.mention}, the export is {size / 1024 / 1024:.1f} MB, over this server's upload limit. "
+                    f"Narrow it down with status or an ID range, turn on compress, or run `python export.py` on the bot's host.",
+                    ephemeral=True
+                )
+                return
+            f.seek(0)
+            filename = export_filename(rows.value, file_format.value, compress)
+            await interaction.followup.send(
+                f"{interaction.user.mention}, here is the export ({size / 1024:.1f} KB).", file=discord.File(f, filename=filename), ephemeral=True
+            )
+        finally:
+            f.close()
 
-        # Get author of the suggestion
-        author = await self.bot.fetch_user(suggestion['author_id'])
+    # Slash command for admins to view suggestion analytics (read from running totals, no scanning)
+    @app_commands.command(name="suggestion_stats", description="View approval rates, top suggestions & contributors and recent activity")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def suggestion_stats(self, interaction: discord.Interaction):
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        analytics = partition.analytics
+        embed = discord.Embed(title="Suggestion stats", timestamp=datetime.datetime.utcnow(), color=0xFFA500)
+
+        # Totals per status & approval rate
+        counts = analytics.status_counts
+        approval_rate = analytics.approval_rate()
+        embed.add_field(
+            name="Suggestions",
+            value=f"{sum(counts.values())} total • {counts.get('pending', 0)} open • {counts.get('approved', 0)} approved • {counts.get('rejected', 0)} rejected\n"
+                  f"Approval rate: {f'{approval_rate:.0%}' if approval_rate is not None else 'n/a'}\n"
+                  f"{analytics.total_votes} votes from {len(analytics.voters)} voters",
+            inline=False
+        )
 
-        embed = discord.Embed(
-            description=f"{interaction.user.mention}, here are the voting results for the following suggestion:\n\n"
-                        f"**Suggestion:** {suggestion['content']}\n\n"
-                        f"**Suggested by:** {author.mention}\n\n"
-                        f"**{tick_emoji}: {len(suggestion['votes'][tick_emoji])}**\n{tick_users}\n\n"
-                        f"**{cross_emoji}: {len(suggestion['votes'][cross_emoji])}**\n{cross_users}",
-            timestamp=datetime.datetime.utcnow(),
-            color=0x8F00FF
+        # Most-supported open suggestions
+        top_open = []
+        for suggestion_id, net_votes in analytics.top_open(stats_top_size):
+            content = partition.store.get(suggestion_id)["content"]
+            top_open.append(f"**{suggestion_id}** ({net_votes:+d}): {content[:60]}{'…' if len(content) > 60 else ''}")
+        embed.add_field(name="Most-supported open suggestions", value="\n".join(top_open) or "None", inline=False)
+
+        # Top contributors
+        embed.add_field(
+            name="Top contributors",
+            value="\n".join(f"{mention(author_id)}: {count}" for author_id, count in analytics.top_authors(stats_top_size)) or "None",
+            inline=False
         )
-        embed.set_footer(text=f"{self.bot.user.display_name} • Suggestion ID: {suggestion_id}")
+
+        # Recent activity
+        embed.add_field(
+            name=f"Last {stats_days} days (suggestions • votes • approved • rejected)",
+            value="\n".join(
+                f"`{day}`: {bucket['suggestions']} • {bucket['votes']} • {bucket['approved']} • {bucket['rejected']}"
+                for day, bucket in analytics.recent_days(stats_days)
+            ),
+            inline=False
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    # Slash command for admins to view the bot's performance metrics
+    @app_commands.command(name="bot_stats", description="View the bot's latency, API call & storage metrics")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def show_bot_stats(self, interaction: discord.Interaction):
+        embed = discord.Embed(title="Bot stats", timestamp=datetime.datetime.utcnow(), color=0x5865F2)
+
+        # Handler latencies (approximate, from histogram buckets)
+        handlers = metrics.histogram_values("handler_latency_seconds")
+        embed.add_field(
+            name="Handler latency (count • p50 • p99)",
+            value="\n".join(
+                f"`{name}`: {histogram.count} • {histogram.quantile(0.5) * 1000:g}ms • {histogram.quantile(0.99) * 1000:g}ms"
+                for name, histogram in sorted(handlers.items())
+            ) or "No data yet",
+            inline=False
+        )
+
+        # Outbound REST calls (busiest routes first)
+        rest_calls = metrics.counter_values("discord_rest_calls_total")
+        busiest = sorted(rest_calls.items(), key=lambda item: item[1], reverse=True)[:5]
+        embed.add_field(
+            name=f"REST calls ({sum(rest_calls.values())} total)",
+            value="\n".join(f"`{route}`: {count}" for route, count in busiest) or "No data yet",
+            inline=False
+        )
+
+        # Storage & event loop
+        flushes = metrics.histogram_values("store_flush_seconds").get(None)
+        written = sum(metrics.counter_values("store_bytes_written_total").values())
+        embed.add_field(
+            name="Storage",
+            value=f"{flushes.count if flushes else 0} flushes • p99 {flushes.quantile(0.99) * 1000 if flushes else 0:g}ms • {written / 1024:.1f} KiB written",
+            inline=False
+        )
+        embed.add_field(name="Event loop lag", value=f"{metrics.gauge('event_loop_lag_seconds') * 1000:.1f}ms", inline=True)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+# Build one page of the /votes embed, plus its next/prev buttons
+# Tallies come from the stored counts and only the mentions for this page are generated
+def votes_page(bot, config, suggestion: dict, page: int, viewer_mention: str):
+    votes = suggestion["votes"]
+    tick_count = votes.count(TICK)
+    cross_count = votes.count(CROSS)
+    page_count = max(1, -(-max(tick_count, cross_count) // votes_page_size))
+    page = min(max(page, 0), page_count - 1)
+    start = page * votes_page_size
+
+    # Voter mentions for this page only
+    tick_users = "\n".join(mention(uid) for uid in votes.page(TICK, start, votes_page_size)) or ("No votes" if not tick_count else "-")
+    cross_users = "\n".join(mention(uid) for uid in votes.page(CROSS, start, votes_page_size)) or ("No votes" if not cross_count else "-")
+
+    embed = discord.Embed(
+        description=f"{viewer_mention}, here are the voting results for the following suggestion:\n\n"
+                    f"**Suggestion:** {suggestion['content']}\n\n"
+                    f"**Suggested by:** {mention(suggestion['author_id'])}\n\n"
+                    f"**{config.tick_emoji}: {tick_count}**\n{tick_users}\n\n"
+                    f"**{config.cross_emoji}: {cross_count}**\n{cross_users}",
+        timestamp=datetime.datetime.utcnow(),
+        color=0x8F00FF
+    )
+    embed.set_footer(text=f"{bot.user.display_name} • Suggestion ID: {suggestion['id']} • Page {page + 1}/{page_count}")
+
+    view = discord.ui.View(timeout=None)
+    if page_count > 1:
+        view.add_item(VotesPageButton(suggestion["id"], page - 1, "prev", disabled=page == 0))
+        view.add_item(VotesPageButton(suggestion["id"], page + 1, "next", disabled=page == page_count - 1))
+    return embed, view
+
+# Next/prev button for /votes pages
+# The suggestion ID and target page are kept in the custom_id, so buttons still work after the bot restarts
+class VotesPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r"votes:(?P<suggestion_id>[0-9]+):(?P<page>-?[0-9]+):(?P<direction>prev|next)"):
+    def __init__(self, suggestion_id: int, page: int, direction: str, disabled: bool = False):
+        super().__init__(discord.ui.Button(
+            label="◀ Prev" if direction == "prev" else "Next ▶",
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"votes:{suggestion_id}:{page}:{direction}",
+            disabled=disabled
+        ))
+        self.suggestion_id = suggestion_id
+        self.page = page
+
+    # Rebuild the button from its custom_id when it is clicked
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["suggestion_id"]), int(match["page"]), match["direction"])
+
+    async def callback(self, interaction: discord.Interaction):
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        store = partition.store
+        suggestion = store.get(self.suggestion_id) or await store.get_archived(self.suggestion_id)
+        if not suggestion:
+            await interaction.response.send_message(f"{interaction.user.mention}, this suggestion is no longer available.", ephemeral=True)
+            return
+        embed, view = votes_page(interaction.client, partition.config, suggestion, self.page, interaction.user.mention)
+        await interaction.response.edit_message(embed=embed, view=view)
+
 # Setup cog and add it to the bot
 async def setup(bot):
     await bot.add_cog(AdminControls(bot))
\ No newline at end of file
@@ -2,96 +2,227 @@
 # - Ensures users cannot select more than one reaction at a time when voting
 # - Auto-deletes messages to ensure the suggestions channel is command-only
 # - Keeps track of votes in JSON
+# - On start-up, rebuilds stored votes from the live reactions to catch up on votes cast while the bot was offline
+# - Every vote update holds the suggestion's lock (partition.locks), so votes on one suggestion are applied one at a time
+#   and never land on a suggestion that an admin is closing
+# - After every vote change, the guild's auto-close scheduler (if it has rules) checks that suggestion's net votes
+#   against the review threshold, so thresholds are found without scanning the suggestions
+# - Reactions are matched to a guild by their channel (bot.partitions), so events from other channels cost one lookup
 
 # Libraries to import
 import discord
 from discord.ext import commands
-from utils.suggestion_management import load_data, save_data
+import asyncio
+import logging
+import time
+from utils.votes import TICK, CROSS
+from utils.reaction_queue import ReactionRemovalQueue
+from utils.metrics import timed
 
-suggestions_channel = 1390343546791268507  # TE Server - #suggestions channel
-tick_emoji = "<:Tick:1422628423620366469>" 
-cross_emoji = "<:Cross:1422628421913149440>" 
+log = logging.getLogger(__name__)
+
+reconcile_workers = 4  # Max suggestion messages read at once during start-up vote reconciliation (across all guilds)
 
 class Events(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Background queue for removing the other reaction when a user switches sides
+        self.removals = ReactionRemovalQueue(bot)
+        # Background start-up vote reconciliation
+        self.reconcile_task = None
+
+    async def cog_load(self):
+        self.removals.start()
+
+    async def cog_unload(self):
+        self.removals.stop()
+        if self.reconcile_task:
+            self.reconcile_task.cancel()
+
+    # --- start-up vote reconciliation ---
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Runs in the background so commands are handled straight away (and only once at a time after reconnects)
+        if self.reconcile_task is None or self.reconcile_task.done():
+            self.reconcile_task = asyncio.create_task(self.reconcile_votes())
+
+    # Reconcile every guild's votes (sharing one limit on messages read at once)
+    async def reconcile_votes(self):
+        limit = asyncio.Semaphore(reconcile_workers)
+        await asyncio.gather(*(self.reconcile_partition(partition, limit) for partition in self.bot.partitions))
+
+    # Compare the stored votes of every pending suggestion in a guild with its live reactions and repair any differences
+    async def reconcile_partition(self, partition, limit: asyncio.Semaphore):
+        await partition.ready.wait()
+        started = time.perf_counter()
+        store = partition.store
+        channel = self.bot.get_channel(partition.config.suggestions_channel)
+        if channel is None:
+            log.warning("[RECONCILE] Could not find the suggestions channel %s", partition.config.suggestions_channel)
+            return
+        pending = store.with_status("pending")
+
+        # Read the tick/cross reactors of every pending suggestion (a few at a time) and apply the corrections
+        # The suggestion's lock is held from read to apply, so votes arriving meanwhile wait instead of being overwritten
+        async def reconcile(suggestion):
+            async with limit, partition.locks(suggestion["id"]):
+                if suggestion["status"] != "pending":
+                    return 0    # Closed since reconciliation started
+                live_votes = await self.read_live_votes(partition, channel, suggestion["message_id"])
+                repaired = self.apply_live_votes(partition, suggestion, live_votes)
+                if repaired and partition.auto_close is not None:
+                    partition.auto_close.check_votes(suggestion)
+                return repaired
+
+        results = await asyncio.gather(*(reconcile(suggestion) for suggestion in pending), return_exceptions=True)
+
+        # Save the corrections in one batch
+        repaired = 0
+        for suggestion, result in zip(pending, results):
+            if isinstance(result, Exception):
+                log.warning("[RECONCILE] Could not read reactions for suggestion %s: %s", suggestion["id"], result)
+                continue
+            repaired += result
+        if repaired:
+            await store.flush()
+
+        log.info("[RECONCILE] Channel %s: checked %d pending suggestions, repaired %d votes in %.2fs", channel.id, len(pending), repaired, time.perf_counter() - started)
+
+    # Read who has reacted tick/cross on a suggestion message (reaction lists are paginated by discord.py)
+    # Returns {TICK: set of user IDs, CROSS: set of user IDs}
+    async def read_live_votes(self, partition, channel, message_id: int):
+        message = await channel.fetch_message(message_id)
+        live_votes = {TICK: set(), CROSS: set()}
+        for reaction in message.reactions:
+            choice = partition.config.vote_choices.get(str(reaction.emoji))
+            if choice is None:
+                continue
+            async for user in reaction.users(limit=None):
+                if user.id != self.bot.user.id:
+                    live_votes[choice].add(user.id)
+        return live_votes
+
+    # Make a suggestion's stored votes match its live reactions, returning how many votes changed
+    # A user found on both sides keeps their stored vote (or tick if they had none) and loses the other reaction
+    def apply_live_votes(self, partition, suggestion: dict, live_votes: dict):
+        store = partition.store
+        config = partition.config
+        votes = suggestion["votes"]
+        live_choices = {}   # User ID -> side they have reacted with
+        for user_id in live_votes[CROSS]:
+            live_choices[user_id] = CROSS
+        for user_id in live_votes[TICK]:
+            if live_choices.get(user_id) == CROSS:
+                keep = votes.choice_of(user_id) or TICK
+                drop = CROSS if keep == TICK else TICK
+                live_choices[user_id] = keep
+                self.removals.request(config.suggestions_channel, suggestion["message_id"], user_id, config.choice_emojis[drop])
+            else:
+                live_choices[user_id] = TICK
+
+        repaired = 0
+        # Votes that are stored but no longer have a reaction
+        for choice in (TICK, CROSS):
+            for user_id in [user_id for user_id in votes.voters(choice) if user_id not in live_choices]:
+                store.remove_vote(suggestion, user_id, choice)
+                repaired += 1
+        # Reactions that are missing from (or on the other side in) the stored votes
+        for user_id, choice in live_choices.items():
+            if votes.choice_of(user_id) != choice:
+                store.add_vote(suggestion, user_id, choice)
+                repaired += 1
+        return repaired
 
     # --- reaction add ---
     @commands.Cog.listener()
+    @timed("listener:on_raw_reaction_add")
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        if payload.channel_id != suggestions_channel:
+        partition = self.bot.partitions.for_channel(payload.channel_id)
+        if partition is None:
             return
+        await partition.ready.wait()    # Votes cast during start-up wait for the guild's data to load
         if payload.user_id == self.bot.user.id:
             return  # ignore bot itself
 
         # Build emoji string exactly like in JSON
         emoji_str = f"<:{payload.emoji.name}:{payload.emoji.id}>" if payload.emoji.id else str(payload.emoji)
-        print(f"[ADD] User {payload.user_id} reacted with {emoji_str}")
+        log.debug("[ADD] User %s reacted with %s", payload.user_id, emoji_str)
 
-        # Load suggestions
-        data = load_data()
-        suggestion = next((s for s in data["suggestions"] if s["message_id"] == payload.message_id), None)
+        # Find the suggestion in the store
+        suggestion = partition.store.get_by_message(payload.message_id)
         if not suggestion:
-            print(f"[ADD] No suggestion found for message {payload.message_id}")
+            log.debug("[ADD] No suggestion found for message %s", payload.message_id)
             return
 
-        # Fetch the message to manage reactions
-        channel = self.bot.get_channel(payload.channel_id)
-        message = await channel.fetch_message(payload.message_id)
-        user = self.bot.get_user(payload.user_id)
-
-        # Enforce single vote: if they reacted tick, remove their cross; if cross, remove their tick
-        if emoji_str == tick_emoji and payload.user_id in suggestion["votes"].get(cross_emoji, []):
-            await message.remove_reaction(cross_emoji, user)
-            suggestion["votes"][cross_emoji].remove(payload.user_id)
-            print(f"[ADD] Removed {payload.user_id} from {cross_emoji} (switched to tick)")
-        elif emoji_str == cross_emoji and payload.user_id in suggestion["votes"].get(tick_emoji, []):
-            await message.remove_reaction(tick_emoji, user)
-            suggestion["votes"][tick_emoji].remove(payload.user_id)
-            print(f"[ADD] Removed {payload.user_id} from {tick_emoji} (switched to cross)")
-
-        # Add the new vote
-        if emoji_str in suggestion["votes"]:
-            if payload.user_id not in suggestion["votes"][emoji_str]:
-                suggestion["votes"][emoji_str].append(payload.user_id)
-                print(f"[ADD] Added {payload.user_id} to {emoji_str}")
-        else:
-            print(f"[ADD] Emoji {emoji_str} not tracked in suggestion votes")
-
-        save_data(data)
-        print(f"[ADD] Data saved: {suggestion['votes']}")
+        # Emoji that isn't a vote reaction
+        choice = partition.config.vote_choices.get(emoji_str)
+        if choice is None:
+            log.debug("[ADD] Emoji %s not tracked in suggestion votes", emoji_str)
+            return
+
+        async with partition.locks(suggestion["id"]):
+            # Closed (e.g. approved) while this vote waited: its votes are final
+            if suggestion["status"] != "pending":
+                log.debug("[ADD] Suggestion %s is already %s", suggestion["id"], suggestion["status"])
+                return
+
+            # Add the new vote (a user holds at most one vote, so switching sides is a single update)
+            previous = partition.store.add_vote(suggestion, payload.user_id, choice)
+            log.debug("[ADD] Added %s to %s", payload.user_id, emoji_str)
+
+            # Enforce single vote: if they switched sides, queue removal of their reaction for the other side
+            # (decided from the store alone, so a vote without a switch makes no API calls)
+            self.removals.discard(payload.channel_id, payload.message_id, payload.user_id, emoji_str)
+            if previous and previous != choice:
+                previous_emoji = partition.config.choice_emojis[previous]
+                self.removals.request(payload.channel_id, payload.message_id, payload.user_id, previous_emoji)
+                log.debug("[ADD] Queued removal of %s from %s (switched to %s)", payload.user_id, previous_emoji, choice)
+
+            log.debug("[ADD] Votes updated: %s %d, %s %d", TICK, suggestion["votes"].count(TICK), CROSS, suggestion["votes"].count(CROSS))
+
+            # Flag the suggestion for review if it has just reached the guild's vote threshold
+            if partition.auto_close is not None:
+                partition.auto_close.check_votes(suggestion)
 
     # --- reaction remove ---
     @commands.Cog.listener()
+    @timed("listener:on_raw_reaction_remove")
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        if payload.channel_id != suggestions_channel:
+        partition = self.bot.partitions.for_channel(payload.channel_id)
+        if partition is None:
             return
+        await partition.ready.wait()    # Votes cast during start-up wait for the guild's data to load
         if payload.user_id == self.bot.user.id:
             return  # ignore bot itself
 
         # Build emoji string
         emoji_str = f"<:{payload.emoji.name}:{payload.emoji.id}>" if payload.emoji.id else str(payload.emoji)
-        print(f"[REMOVE] User {payload.user_id} removed {emoji_str}")
+        log.debug("[REMOVE] User %s removed %s", payload.user_id, emoji_str)
 
-        # Load suggestions
-        data = load_data()
-        suggestion = next((s for s in data["suggestions"] if s["message_id"] == payload.message_id), None)
+        # Find the suggestion in the store
+        suggestion = partition.store.get_by_message(payload.message_id)
         if not suggestion:
-            print(f"[REMOVE] No suggestion found for message {payload.message_id}")
+            log.debug("[REMOVE] No suggestion found for message %s", payload.message_id)
             return
 
         # Update votes
-        if emoji_str in suggestion["votes"]:
-            if payload.user_id in suggestion["votes"][emoji_str]:
-                suggestion["votes"][emoji_str].remove(payload.user_id)
-                print(f"[REMOVE] Removed {payload.user_id} from {emoji_str}")
+        choice = partition.config.vote_choices.get(emoji_str)
+        if choice is None:
+            log.debug("[REMOVE] Emoji %s not tracked in suggestion votes", emoji_str)
+            return
+        async with partition.locks(suggestion["id"]):
+            if suggestion["status"] != "pending":
+                log.debug("[REMOVE] Suggestion %s is already %s", suggestion["id"], suggestion["status"])
+                return
+            if partition.store.remove_vote(suggestion, payload.user_id, choice):
+                log.debug("[REMOVE] Removed %s from %s", payload.user_id, emoji_str)
+                # Removing a cross raises the net votes
+                if partition.auto_close is not None:
+                    partition.auto_close.check_votes(suggestion)
             else:
-                print(f"[REMOVE] {payload.user_id} was not in {emoji_str}")
-        else:
-            print(f"[REMOVE] Emoji {emoji_str} not tracked in suggestion votes")
+                log.debug("[REMOVE] %s was not in %s", payload.user_id, emoji_str)
 
-        save_data(data)
-        print(f"[REMOVE] Data saved: {suggestion['votes']}")
+            log.debug("[REMOVE] Votes updated: %s %d, %s %d", TICK, suggestion["votes"].count(TICK), CROSS, suggestion["votes"].count(CROSS))
 
 async def setup(bot):
     await bot.add_cog(Events(bot))
\ No newline at end of file
@@ -1,59 +1,126 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import aiosqlite
+import asyncio
+import heapq
+import itertools
+import logging
+from utils.metrics import timed
+
+log = logging.getLogger(__name__)
 
 
 class Reminders(commands.Cog):
     FIXED_TIMEZONE_OFFSET = 8  # GMT+8
+    TIMEZONE = timezone(timedelta(hours=FIXED_TIMEZONE_OFFSET))
 
     def __init__(self, bot):
         self.bot = bot
-        self.check_reminders.start()
+        self.db = None            # Single connection, opened in cog_load
+        self.reminders = {}       # rowid -> (guild_id, channel_id, time, message)
+        self.schedule = []        # Min-heap of (next fire timestamp, token, rowid)
+        self.tokens = {}          # rowid -> token of its current heap entry (older entries are stale)
+        self.next_token = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.scheduler_task = None
 
     # ---------- DB INITIALIZATION ----------
     async def init_db(self):
-        async with aiosqlite.connect("reminders.db") as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS reminders (
-                    guild_id INTEGER,
-                    channel_id INTEGER,
-                    time TEXT,
-                    message TEXT
-                )
-            """)
-            await db.commit()
-
-    @commands.Cog.listener()
-    async def on_ready(self):
+        self.db = await aiosqlite.connect("reminders.db")
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS reminders (
+                guild_id INTEGER,
+                channel_id INTEGER,
+                time TEXT,
+                message TEXT
+            )
+        """)
+        await self.db.commit()
+
+    async def cog_load(self):
         await self.init_db()
-        print("[Reminder Cog] Database initialized")
+        rows = await self.db.execute_fetchall(
+            "SELECT rowid, guild_id, channel_id, time, message FROM reminders"
+        )
+        for rowid, guild_id, channel_id, reminder_time, message in rows:
+            self.schedule_reminder(rowid, guild_id, channel_id, reminder_time, message)
+        log.info("[Reminder Cog] Database initialized, %d reminders scheduled", len(rows))
+        self.scheduler_task = asyncio.create_task(self.check_reminders())
+
+    async def cog_unload(self):
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+        if self.db:
+            await self.db.close()
+
+    # ---------- SCHEDULE ----------
+    def next_fire_time(self, reminder_time: str, after: datetime):
+        """Next occurrence of HH:MM (GMT+8) strictly after `after`, as a UTC timestamp."""
+        hour, minute = map(int, reminder_time.split(":"))
+        local_after = after.astimezone(self.TIMEZONE)
+        fire_at = local_after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if fire_at <= local_after:
+            fire_at += timedelta(days=1)
+        return fire_at.timestamp()
+
+    def schedule_reminder(self, rowid, guild_id, channel_id, reminder_time, message):
+        self.reminders[rowid] = (guild_id, channel_id, reminder_time, message)
+        self.push(rowid, self.next_fire_time(reminder_time, datetime.now(timezone.utc)))
+        self.wakeup.set()
+
+    # Schedule a reminder's next occurrence; any entry already in the heap for it becomes stale
+    # (SQLite reuses the rowid of a deleted reminder, so the rowid alone can't tell entries apart)
+    def push(self, rowid, fire_at):
+        token = next(self.next_token)
+        self.tokens[rowid] = token
+        heapq.heappush(self.schedule, (fire_at, token, rowid))
 
     # ---------- REMINDER LOOP ----------
-    @tasks.loop(seconds=30)
     async def check_reminders(self):
-        now_utc = datetime.utcnow()
-        now_gmt8 = now_utc.replace(hour=(now_utc.hour + self.FIXED_TIMEZONE_OFFSET) % 24)
-
-        current_time = now_gmt8.strftime("%H:%M")
-
-        async with aiosqlite.connect("reminders.db") as db:
-            rows = await db.execute_fetchall(
-                "SELECT channel_id, time, message FROM reminders"
-            )
-
-        for channel_id, reminder_time, message in rows:
-            if reminder_time == current_time:
-                channel = self.bot.get_channel(channel_id)
-                if channel:
-                    await channel.send(message)
-
-    @check_reminders.before_loop
-    async def before_check(self):
-        print("Reminder loop waiting for bot ready...")
+        log.debug("Reminder loop waiting for bot ready...")
         await self.bot.wait_until_ready()
 
+        while True:
+            self.wakeup.clear()
+
+            # Drop heap entries for reminders that have since been deleted or rescheduled
+            while self.schedule and self.tokens.get(self.schedule[0][2]) != self.schedule[0][1]:
+                heapq.heappop(self.schedule)
+
+            # Nothing scheduled: sleep until a reminder is added
+            if not self.schedule:
+                await self.wakeup.wait()
+                continue
+
+            # Sleep until the next reminder is due (or the schedule changes)
+            fire_at, _, rowid = self.schedule[0]
+            delay = fire_at - datetime.now(timezone.utc).timestamp()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Due: send it once, then schedule the next day's occurrence
+            heapq.heappop(self.schedule)
+            guild_id, channel_id, reminder_time, message = self.reminders[rowid]
+            after = max(datetime.fromtimestamp(fire_at, timezone.utc), datetime.now(timezone.utc))
+            self.push(rowid, self.next_fire_time(reminder_time, after))
+
+            await self.send_reminder(rowid, channel_id, message)
+
+    @timed("task:Reminders.check_reminders")
+    async def send_reminder(self, rowid, channel_id, message):
+        channel = self.bot.get_channel(channel_id)
+        if channel:
+            try:
+                await channel.send(message)
+            except discord.HTTPException as e:
+                log.warning("[Reminder Cog] Failed to send reminder %s: %s", rowid, e)
+
     # ---------- SLASH COMMANDS ----------
     @app_commands.command(name="add_reminder", description="Add a reminder (time is GMT+8)")
     @app_commands.describe(
@@ -69,7 +136,7 @@ class Reminders(commands.Cog):
         mention: discord.Role | discord.User | None = None,
     ):
         """Slash command: /add_reminder time:HH:MM message:'text' mention:@user_or_role"""
-    
+
         # Validate time format
         try:
             datetime.strptime(time, "%H:%M")
@@ -78,31 +145,31 @@ class Reminders(commands.Cog):
                 "❌ Time must be in **HH:MM (24h format, GMT+8)**",
                 ephemeral=True
             )
-    
+
         # Store message including mention (if supplied)
         final_message = f"{mention.mention}\n{message}" if mention else message
-    
-        async with aiosqlite.connect("reminders.db") as db:
-            await db.execute(
-                "INSERT INTO reminders (guild_id, channel_id, time, message) VALUES (?, ?, ?, ?)",
-                (interaction.guild_id, interaction.channel_id, time, final_message)
-            )
-            await db.commit()
-    
+
+        cursor = await self.db.execute(
+            "INSERT INTO reminders (guild_id, channel_id, time, message) VALUES (?, ?, ?, ?)",
+            (interaction.guild_id, interaction.channel_id, time, final_message)
+        )
+        await self.db.commit()
+        self.schedule_reminder(cursor.lastrowid, interaction.guild_id, interaction.channel_id, time, final_message)
+
         await interaction.response.send_message(
             f"✅ Reminder added for **{time} GMT+8**\n"
             f"Message: `{message}`"
             + (f"\nWill mention: {mention.mention}" if mention else "")
         )
 
-    
+
     @app_commands.command(name="list_reminders", description="List all reminders for this server")
     async def list_reminders(self, interaction: discord.Interaction):
-        async with aiosqlite.connect("reminders.db") as db:
-            rows = await db.execute_fetchall(
-                "SELECT time, message FROM reminders WHERE guild_id = ?",
-                (interaction.guild_id,)
-            )
+        rows = [
+            (reminder_time, msg)
+            for guild_id, _, reminder_time, msg in self.reminders.values()
+            if guild_id == interaction.guild_id
+        ]
 
         if not rows:
             return await interaction.response.send_message("No reminders set.", ephemeral=True)
@@ -112,12 +179,21 @@ class Reminders(commands.Cog):
 
     @app_commands.command(name="delete_reminder", description="Delete a reminder by time (HH:MM)")
     async def delete_reminder(self, interaction: discord.Interaction, time: str):
-        async with aiosqlite.connect("reminders.db") as db:
-            await db.execute(
-                "DELETE FROM reminders WHERE guild_id = ? AND time = ?",
-                (interaction.guild_id, time)
-            )
-            await db.commit()
+        rows = await self.db.execute_fetchall(
+            "SELECT rowid FROM reminders WHERE guild_id = ? AND time = ?",
+            (interaction.guild_id, time)
+        )
+        await self.db.execute(
+            "DELETE FROM reminders WHERE guild_id = ? AND time = ?",
+            (interaction.guild_id, time)
+        )
+        await self.db.commit()
+
+        # Heap entries for these are dropped lazily by the scheduler
+        for (rowid,) in rows:
+            self.reminders.pop(rowid, None)
+            self.tokens.pop(rowid, None)
+        self.wakeup.set()
 
         await interaction.response.send_message(
             f"🗑️ Removed reminder set for **{time} GMT+8**"
@@ -1,35 +1,39 @@
 # Overview for suggestions.py
 # - Cog for handling suggestions that Discord users can make
 # - Allows admins to create panels with a button that sends the user a modal to make a suggestion
+# - /search_suggestions searches current & past suggestions (served from the guild's search index)
+# - Contains the PanelManager, which keeps a single suggestion panel at the bottom of a guild's suggestions channel
+# - Each guild's channels, emojis & suggestions come from its partition (utils/guilds.py)
 
 # Libraries to import
 import discord
 from discord.ext import commands
 from discord import app_commands
 import datetime
-from utils.suggestion_management import load_data, save_data, get_next_id, get_panel_id, set_panel_id
+import asyncio
+import time
+import logging
+from utils.votes import VoteSet, TICK, CROSS
+from utils.metrics import timed
+from utils.guilds import partition_for
+
+log = logging.getLogger(__name__)
 
 # Universal variables
-suggestions_channel = 1390343546791268507  # TE Server - #suggestions channel
-reviewed_suggestions_channel = 1390343546791268507 # TE Server - #suggestions channel - If this channel is different from suggestions_channel, please review the code in the /approve and /deny slash commands.
-bot_id = 981854054760185927 # The ID of the bot on Discord
-tick_emoji = "<:Tick:1422628423620366469>" # emoji from TE Discord
-tick_emoji_id = 1422628423620366469
-cross_emoji = "<:Cross:1422628421913149440>" # emoji from TE Discord
-cross_emoji_id = 1422628421913149440
+panel_quiet_window = 2.0 # Seconds without new requests before the panel is reposted
+search_results_size = 10 # Suggestions listed by /search_suggestions
 
 # Suggestions cog
 class Suggestions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        # Load persistent data (JSON)
-        self.data = load_data()
 
-    # Discord Modal for users to submit suggestions
+    # Discord Modal for users to submit suggestions (to the guild of the given partition)
     class SuggestModal(discord.ui.Modal):
-        def __init__(self, bot):
+        def __init__(self, bot, partition):
             super().__init__(title="Making a Suggestion")
             self.bot = bot
+            self.partition = partition
             # Text field for suggestion
             self.suggestion_input = discord.ui.TextInput(
                 label="Suggestion",
@@ -41,26 +45,23 @@ class Suggestions(commands.Cog):
             )
             self.add_item(self.suggestion_input)
 
+        @timed("modal:SuggestModal.on_submit")
         async def on_submit(self, interaction: discord.Interaction):
+            partition = self.partition
+            config = partition.config
             try:
                 await interaction.response.defer()
                 # Get suggestion channel
-                channel = self.bot.get_channel(suggestions_channel)
+                channel = self.bot.get_channel(config.suggestions_channel)
                 if channel is None:
                     await interaction.followup.send("❌ Could not find the suggestions channel.", ephemeral=True)
                     return
 
-                # Get & delete current suggestion panel
-                panel_id = get_panel_id()
-                if panel_id:
-                    try:
-                        suggestion_panel = await channel.fetch_message(panel_id)
-                        await suggestion_panel.delete()  # Remove old panel before posting new
-                    except:
-                        pass
+                # Check for likely duplicates of existing suggestions
+                duplicates = partition.similarity.query(self.suggestion_input.value)
 
                 # Generates unique suggestion ID
-                suggestion_id = get_next_id()
+                suggestion_id = partition.store.next_id()
 
                 # Creates a Discord embed for the suggestion
                 embed = discord.Embed(
@@ -70,40 +71,39 @@ class Suggestions(commands.Cog):
                 )
                 embed.set_footer(text=f"{self.bot.user.display_name} • Suggestion ID: {suggestion_id}")
                 embed.set_thumbnail(url=interaction.user.display_avatar.url)
+                if duplicates:
+                    embed.add_field(name="Possibly similar to", value=", ".join(f"Suggestion ID {duplicate_id}" for duplicate_id, _ in duplicates))
 
                 # Sends the suggestion message
                 bot_message = await channel.send(embed=embed)
-                tick_custom_emoji = self.bot.get_emoji(tick_emoji_id)
-                cross_custom_emoji = self.bot.get_emoji(cross_emoji_id)
-                await bot_message.add_reaction(tick_custom_emoji)
-                await bot_message.add_reaction(cross_custom_emoji)
-
-                # Saves suggestion to JSON storage
-                data = load_data()
-                data["suggestions"].append({
+                await bot_message.add_reaction(config.reaction(self.bot, TICK))
+                await bot_message.add_reaction(config.reaction(self.bot, CROSS))
+
+                # Saves suggestion to the store
+                suggestion = {
                     "id": suggestion_id,
                     "message_id": bot_message.id,
                     "author_id": interaction.user.id,
                     "content": self.suggestion_input.value,
-                    "votes": {tick_emoji: [], cross_emoji: []},
+                    "votes": VoteSet(),
                     "status": "pending",
                     "staff_response": None
-                })
-                save_data(data)
-
-                # Makes a new suggestion panel
-                panel_embed = discord.Embed(
-                    description=f"**Make a Suggestion**\n\nIf you have something you would like to suggest relating to TLOU Esports, feel free to press the button below and type in your suggestion on the pop-up screen that follows.",
-                    color=0x00FF00
-                )
-                reviewed_suggestions = self.bot.get_channel(reviewed_suggestions_channel)
-                new_panel = await channel.send(f"```yaml\n\nWelcome to Suggestions!\n\n```\n• Before making a suggestion, be sure to check the messages __above__ this one to see suggestions that other members have posted.\n\n• Use the {tick_emoji}/{cross_emoji} reaction buttons to cast your votes! This will help us in the decision-making process when we come to review the community's suggestions.\n\n• It's also a good idea to check {reviewed_suggestions.mention} to view suggestions that have already been approved/rejected by staff.\n\n*Please avoid duplicating any suggestion that has been previously made within a short space of time & try to stick to one suggestion per use, as this will streamline the voting & reviewal processes. Any message that has not been made using the bot is automatically removed from this channel. Usual server rules apply.*", embed=panel_embed, view=Suggestions.SuggestionsPanelButton(self.bot))
-                set_panel_id(new_panel.id)
-
-                # Respond to user that sent a modal
-                await interaction.followup.send(f"Thanks for your suggestion, {interaction.user.mention}!", ephemeral=True)
-            except Exception as e:
-                print(f"Error in SuggestModal.on_submit: {e}")
+                }
+                partition.store.add_suggestion(suggestion)
+                partition.similarity.add(suggestion_id, self.suggestion_input.value)
+                # Detect its language in the background (in a worker thread, so this reply isn't delayed)
+                partition.languages.tag_later(suggestion)
+
+                # Move the suggestion panel back to the bottom of the channel
+                partition.panel.request_repost()
+
+                # Respond to user that sent a modal (pointing out any likely duplicates)
+                thanks = f"Thanks for your suggestion, {interaction.user.mention}!"
+                if duplicates:
+                    thanks += f"\nIt looks similar to existing suggestion(s): {', '.join(str(duplicate_id) for duplicate_id, _ in duplicates)}. Please check these aren't the same idea."
+                await interaction.followup.send(thanks, ephemeral=True)
+            except Exception:
+                log.exception("Error in SuggestModal.on_submit")
                 await interaction.followup.send("❌ Something went wrong while submitting your suggestion.", ephemeral=True)
 
     # Panel button for users to submit a suggestion
@@ -114,32 +114,113 @@ class Suggestions(commands.Cog):
 
         @discord.ui.button(label="Send a Suggestion", style=discord.ButtonStyle.green, custom_id="suggest_button")
         async def suggest_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-            await interaction.response.send_modal(Suggestions.SuggestModal(self.bot))
+            partition = await partition_for(interaction)
+            if partition:
+                await interaction.response.send_modal(Suggestions.SuggestModal(self.bot, partition))
 
     # --- SLASH COMMANDS---
 
     # A back-up slash command '/suggest' that users can make suggestions with, in case the panel fails to work
     @app_commands.command(name="suggest", description="Make a suggestion for the server")
     async def suggest(self, interaction: discord.Interaction):
-        await interaction.response.send_modal(Suggestions.SuggestModal(self.bot))
+        partition = await partition_for(interaction)
+        if partition:
+            await interaction.response.send_modal(Suggestions.SuggestModal(self.bot, partition))
     
     # A command for staff to manually send the suggestion panel
     @app_commands.command(name="suggestion_panel", description="Send the suggestion panel to the suggestions channel")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def suggestion_panel(self, interaction: discord.Interaction):
-        channel = self.bot.get_channel(suggestions_channel)
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        await partition.panel.repost()
+        await interaction.response.send_message(f"{interaction.user.mention}, the suggestion panel has been sent!", ephemeral=True)
 
-        # Create panel embed
-        panel_embed = discord.Embed(
-            description=f"**Make a Suggestion**\n\nIf you have something you would like to suggest relating to TLOU Esports, feel free to press the button below and type in your suggestion on the pop-up screen that follows.",
-            color=0x00FF00
+    # A command to search current & past suggestions, best matches first
+    @app_commands.command(name="search_suggestions", description="Search current & past suggestions")
+    @app_commands.describe(query="Words to look for in suggestions & staff responses", status="Only show suggestions with this status")
+    @app_commands.choices(status=[
+        app_commands.Choice(name="Pending", value="pending"),
+        app_commands.Choice(name="Approved", value="approved"),
+        app_commands.Choice(name="Rejected", value="rejected")
+    ])
+    @timed("command:/search_suggestions")
+    async def search_suggestions(self, interaction: discord.Interaction, query: str, status: app_commands.Choice[str] = None):
+        partition = await partition_for(interaction)
+        if not partition:
+            return
+        search = partition.search
+        results = search.search(query, status.value if status else None, search_results_size)
+        if not results:
+            await interaction.response.send_message(f"{interaction.user.mention}, no suggestions match `{query}`.", ephemeral=True)
+            return
+        embed = discord.Embed(
+            title=f"Suggestions matching \"{query[:200]}\"" + (f" ({status.value})" if status else ""),
+            description="\n".join(f"**{suggestion_id}** • {search.status_of(suggestion_id)} • {search.snippet(suggestion_id)}" for suggestion_id, _ in results),
+            color=0xFFA500
         )
-        reviewed_suggestions = self.bot.get_channel(reviewed_suggestions_channel)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        panel_message = await channel.send(f"```yaml\n\nWelcome to Suggestions!\n\n```\n• Before making a suggestion, be sure to check the messages __above__ this one to see suggestions that other members have posted.\n\n• Use the {tick_emoji}/{cross_emoji} reaction buttons to cast your votes! This will help us in the decision-making process when we come to review the community's suggestions.\n\n• It's also a good idea to check {reviewed_suggestions.mention} to view suggestions that have already been approved/rejected by staff.\n\n*Please avoid duplicating any suggestion that has been previously made within a short space of time & try to stick to one suggestion per use, as this will streamline the voting & reviewal processes. Any message that has not been made using the bot is automatically removed from this channel. Usual server rules apply.*", embed=panel_embed, view=Suggestions.SuggestionsPanelButton(self.bot))
-
-        set_panel_id(panel_message.id)
-        await interaction.response.send_message(f"{interaction.user.mention}, the suggestion panel has been sent!", ephemeral=True)
+# Keeps one suggestion panel at the bottom of a guild's suggestions channel (created in main.py as partition.panel)
+# Bursts of repost requests (several submissions or reviews in a row) are collapsed into a single delete + send
+class PanelManager:
+    def __init__(self, bot, partition, quiet_window: float = panel_quiet_window):
+        self.bot = bot
+        self.partition = partition
+        self.quiet_window = quiet_window
+        self._lock = asyncio.Lock()     # Only one panel repost at a time
+        self._last_request = 0.0        # time.monotonic() of the latest repost request
+        self._task = None               # Pending debounced repost
+        self._content = None            # Panel text & embed, built once
+        self._embed = None
+
+    # Build the panel message text & embed (only done once)
+    def _build(self):
+        if self._content is None:
+            config = self.partition.config
+            self._embed = discord.Embed(
+                description=f"**Make a Suggestion**\n\nIf you have something you would like to suggest relating to TLOU Esports, feel free to press the button below and type in your suggestion on the pop-up screen that follows.",
+                color=0x00FF00
+            )
+            self._content = f"```yaml\n\nWelcome to Suggestions!\n\n```\n• Before making a suggestion, be sure to check the messages __above__ this one to see suggestions that other members have posted.\n\n• Use the {config.tick_emoji}/{config.cross_emoji} reaction buttons to cast your votes! This will help us in the decision-making process when we come to review the community's suggestions.\n\n• It's also a good idea to check <#{config.reviewed_channel}> to view suggestions that have already been approved/rejected by staff.\n\n*Please avoid duplicating any suggestion that has been previously made within a short space of time & try to stick to one suggestion per use, as this will streamline the voting & reviewal processes. Any message that has not been made using the bot is automatically removed from this channel. Usual server rules apply.*"
+        return self._content, self._embed
+
+    # Ask for the panel to be moved to the bottom once things have been quiet for quiet_window seconds
+    def request_repost(self):
+        self._last_request = time.monotonic()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._debounced_repost())
+
+    # Wait for the quiet window, repost, and go again if more requests came in meanwhile
+    async def _debounced_repost(self):
+        while True:
+            wait = self._last_request + self.quiet_window - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            requested = self._last_request
+            try:
+                await self.repost()
+            except Exception:
+                log.exception("Error in PanelManager repost")
+            if self._last_request == requested:
+                return
+
+    # Delete the current panel (if any) and send a new one at the bottom of the channel
+    async def repost(self):
+        async with self._lock:
+            store = self.partition.store
+            channel = self.bot.get_channel(self.partition.config.suggestions_channel)
+            panel_id = store.panel_id
+            if panel_id:
+                try:
+                    await channel.get_partial_message(panel_id).delete()  # Remove old panel before posting new
+                except discord.HTTPException:
+                    pass
+            content, embed = self._build()
+            new_panel = await channel.send(content, embed=embed, view=Suggestions.SuggestionsPanelButton(self.bot))
+            store.set_panel_id(new_panel.id)
 
 # Setup cog and add it to the bot
 async def setup(bot):
@@ -0,0 +1,61 @@
+# Overview
+# - Command-line export of a guild's suggestions or votes, the same export as /export_suggestions (see utils/export.py)
+#   without Discord's upload limit
+# - Opens the guild's data read-only, so it can run while the bot is running: no data file is created or changed
+#   (an SQLite database is opened with mode=ro; SQLite itself may still create its -wal/-shm side files)
+# - Uses the same STORAGE_MODE, SQLITE_PATH & ARCHIVE_CLOSED settings as main.py
+# - Examples:
+#   python export.py --rows votes --format csv --gzip -o votes.csv.gz
+#   python export.py --status approved --min-id 100 --max-id 200 --guild 123
+
+# Libraries to import
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from utils.guilds import create_store, load_guild_configs, guilds_file
+from utils.sqlite_store import sqlite_file
+from utils.export import iter_suggestions, export_chunks, export_rows, export_formats, write_export
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export suggestions or votes as NDJSON or CSV")
+    parser.add_argument("--rows", choices=export_rows, default="suggestions", help="one row per suggestion, or one row per vote")
+    parser.add_argument("--format", choices=export_formats, default="ndjson", dest="file_format")
+    parser.add_argument("--gzip", action="store_true", help="compress the output with gzip")
+    parser.add_argument("--status", choices=("pending", "approved", "rejected"), help="only export suggestions with this status")
+    parser.add_argument("--min-id", type=int, help="lowest suggestion ID to export")
+    parser.add_argument("--max-id", type=int, help="highest suggestion ID to export")
+    parser.add_argument("--guild", type=int, help=f"guild to export (needed when {guilds_file} lists several)")
+    parser.add_argument("-o", "--output", help="file to write (default: standard output)")
+    return parser.parse_args()
+
+async def export(args):
+    configs = load_guild_configs()
+    if args.guild is not None:
+        configs = [config for config in configs if config.guild_id in (args.guild, None)]
+    if len(configs) != 1:
+        sys.exit(f"Pick one guild with --guild ({len(configs)} match)")
+    store = create_store(
+        configs[0],
+        os.getenv("STORAGE_MODE", "json"),
+        archive_closed=os.getenv("ARCHIVE_CLOSED", "1") != "0",
+        sqlite_name=os.getenv("SQLITE_PATH", sqlite_file)
+    )
+    await store.open_read_only()
+    try:
+        suggestions = iter_suggestions(store.data["suggestions"], store.archive, args.status, args.min_id, args.max_id)
+        chunks = export_chunks(suggestions, args.rows, args.file_format, args.gzip)
+        if args.output:
+            with open(args.output, "wb") as f:
+                size = await asyncio.to_thread(write_export, f, chunks)
+            print(f"Wrote {size} bytes to {args.output}", file=sys.stderr)
+        else:
+            await asyncio.to_thread(write_export, sys.stdout.buffer, chunks)
+            sys.stdout.flush()
+    finally:
+        await store.close_read_only()
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(export(parse_args()))
@@ -1,30 +1,92 @@
 # Overview
-# - Sets up the bot with libraries & intents
+# - Sets up the bot with libraries & intents (as an AutoShardedBot if SHARD_COUNT is set)
+# - Reads the guilds the bot serves (data/guilds.json, see utils/guilds.py) and creates each guild's partition:
+#   its suggestions store, suggestion panel manager, per-suggestion locks, duplicate-detection index,
+#   search index, language classifier, suggestion analytics & auto-close scheduler (for guilds with auto-close rules)
 # - Loads all files from the "cogs" folder
+# - Connects to Discord straight away while the guilds' data is loaded in the background (warm-up);
+#   the command tree is only synced when it has changed since the last sync (see utils/command_sync.py)
+# - Sets up queue-backed logging & metrics (optionally served in Prometheus format)
+# - Starts the optional read-only stats API
 # - Starts the bot
 
 # Libraries to import
 import os
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from discord.ext import commands
 import discord
-from cogs.suggestions import Suggestions
+from cogs.suggestions import Suggestions, PanelManager
+from cogs.admin_controls import auto_close_sweep
+from utils.suggestion_management import default_flush_interval, default_flush_threshold, default_compact_threshold
+from utils.sqlite_store import sqlite_file
+from utils.guilds import GuildPartition, GuildPartitions, create_store, load_guild_configs, shard_of, guilds_file
+from utils.analytics import SuggestionAnalytics, analytics_file
+from utils.similarity import SimilarityIndex, similarity_file
+from utils.search import SearchIndex
+from utils.language import LanguageClassifier
+from utils.auto_close import AutoCloseScheduler, auto_close_file
+from utils.stats_api import StatsPublisher, HTTPServerThread, create_app, default_stats_api_host
+from utils.metrics import metrics, instrument_http, measure_loop_lag, create_metrics_app
+from utils.command_sync import sync_commands
+from utils.log import setup_logging
+
+log = logging.getLogger("main")
+
+# Start-up timing (time-to-ready is logged and exported as the startup_seconds metric)
+process_started = time.perf_counter()
+first_ready = True
+
+load_dotenv()
 
 # Bot definition & intents
 description = "A bot for making, voting on & approving suggestions, coded by Raven Fyre for use in the TLOU Esports Discord server."
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix=".", description=description, help_command=None, intents=intents)
+# Sent when identifying, so the presence survives reconnects without setting it again
+activity = discord.Activity(type=discord.ActivityType.watching, name='TLOU Esports')
+# SHARD_COUNT runs the bot as an AutoShardedBot ("auto" lets Discord pick the number of shards)
+# SHARD_IDS (e.g. 0,1) runs only some of the shards in this process, so they can be split across processes;
+# each process then only loads the guilds whose events reach its shards
+shard_count = os.getenv("SHARD_COUNT")
+shard_ids = [int(shard_id) for shard_id in os.getenv("SHARD_IDS").split(",")] if os.getenv("SHARD_IDS") else None
+# Splitting shards across processes needs every process to agree on the number of shards
+if shard_ids is not None and not (shard_count and shard_count.isdigit()):
+    raise SystemExit("SHARD_IDS needs SHARD_COUNT set to a number of shards (not \"auto\")")
+if shard_ids is not None and not all(0 <= shard_id < int(shard_count) for shard_id in shard_ids):
+    raise SystemExit(f"SHARD_IDS must be between 0 and {int(shard_count) - 1} (SHARD_COUNT is {shard_count})")
+if shard_count:
+    bot = commands.AutoShardedBot(
+        command_prefix=".", description=description, help_command=None, intents=intents, activity=activity,
+        shard_count=None if shard_count == "auto" else int(shard_count), shard_ids=shard_ids
+    )
+else:
+    bot = commands.Bot(command_prefix=".", description=description, help_command=None, intents=intents, activity=activity)
 
-# Initial start-up event when the bot first runs or restarts
+# One-time set-up, after logging in and before connecting to the gateway
 @bot.event
-async def on_ready():
+async def setup_hook():
+    # Let suggestion panels sent before a restart keep working
+    bot.add_view(Suggestions.SuggestionsPanelButton(bot))
+    # Sync the slash commands only if they changed since the last sync
     try:
-        bot.add_view(Suggestions.SuggestionsPanelButton(bot))
-    except:
-        pass
-    await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.watching, name='TLOU Esports'))
-    await bot.tree.sync()
-    print("TE Suggestions is online! Commands synced.")
+        await sync_commands(bot.tree, bot.application_id, force=os.getenv("FORCE_COMMAND_SYNC") == "1")
+    except discord.HTTPException:
+        log.exception("Could not sync the command tree")
+
+# Fires when the bot first connects and again after every gateway reconnect, so it only logs
+@bot.event
+async def on_ready():
+    global first_ready
+    if first_ready:
+        first_ready = False
+        ready_seconds = time.perf_counter() - process_started
+        metrics.set("startup_seconds", ready_seconds, "gateway_ready")
+        log.info("TE Suggestions is online! Ready %.2fs after start-up", ready_seconds)
+    else:
+        log.info("TE Suggestions reconnected")
 
 # Load cogs
 async def load_cogs():
@@ -33,12 +95,97 @@ async def load_cogs():
     await bot.load_extension("cogs.admin_controls")
     await bot.load_extension("cogs.fis_pay_reminders")
 
+# Create one guild's partition, with its files in the guild's data folder
+def create_partition(config, language_executor: ThreadPoolExecutor):
+    # In-memory store, flushed to disk in the background
+    # STORAGE_MODE=journal appends each change to a journal instead of rewriting suggestions.json
+    # STORAGE_MODE=sqlite keeps suggestions and votes in an SQLite database (see utils/sqlite_store.py)
+    # Approved & rejected suggestions are moved to a compressed archive (set ARCHIVE_CLOSED=0 to keep them in the working set)
+    # SQLITE_PATH names the database file in each data folder
+    store = create_store(
+        config,
+        os.getenv("STORAGE_MODE", "json"),
+        archive_closed=os.getenv("ARCHIVE_CLOSED", "1") != "0",
+        sqlite_name=os.getenv("SQLITE_PATH", sqlite_file),
+        flush_interval=float(os.getenv("STORE_FLUSH_INTERVAL", default_flush_interval)),
+        flush_threshold=int(os.getenv("STORE_FLUSH_THRESHOLD", default_flush_threshold)),
+        compact_threshold=int(os.getenv("STORE_COMPACT_THRESHOLD", default_compact_threshold))
+    )
+    partition = GuildPartition(
+        config,
+        store,
+        # Duplicate-suggestion detection (loads the saved index, then adds any suggestions it hasn't seen)
+        SimilarityIndex(config.path(similarity_file)),
+        # Running suggestion analytics for /suggestion_stats (updated from every store change)
+        SuggestionAnalytics(store, config.path(analytics_file)),
+        # Full-text search & suggestion ID autocomplete (updated from every new suggestion & review)
+        SearchIndex(store),
+        # Language tagging (runs off the event loop; existing suggestions are tagged in the background)
+        LanguageClassifier(store, language_executor)
+    )
+    # Suggestion panel manager (keeps the panel at the bottom of the guild's suggestions channel)
+    partition.panel = PanelManager(bot, partition)
+    # Auto-close & review-threshold rules (closes and flags suggestions in batches, see utils/auto_close.py)
+    if config.auto_close:
+        partition.auto_close = AutoCloseScheduler(
+            store, config, lambda due_ids, flagged_ids: auto_close_sweep(bot, partition, due_ids, flagged_ids), config.path(auto_close_file)
+        )
+    return partition
+
+# Load every guild's data in the background while the bot connects (handlers wait for their guild's ready event)
+async def warm_up():
+    try:
+        await asyncio.gather(*(partition.start() for partition in bot.partitions))
+    except Exception:
+        log.exception("Could not load the suggestions data, shutting down")
+        await bot.close()
+        return
+    warm_up_seconds = time.perf_counter() - process_started
+    metrics.set("startup_seconds", warm_up_seconds, "warm_up")
+    log.info("Loaded %d guild(s) %.2fs after start-up", len(bot.partitions), warm_up_seconds)
+
 # Run bot
 async def main():
+    log_listener = setup_logging(os.getenv("LOG_LEVEL", "INFO"))
+    # Guilds served by this process (with SHARD_IDS, only those on this process's shards)
+    configs = load_guild_configs(os.getenv("GUILDS_FILE", guilds_file))
+    if shard_ids is not None:
+        configs = [config for config in configs if config.guild_id is None or shard_of(config.guild_id, int(shard_count)) in shard_ids]
+    # One worker thread does the language detection of every guild
+    language_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="langdetect")
+    bot.partitions = GuildPartitions(create_partition(config, language_executor) for config in configs)
     async with bot:
-        await load_cogs()
-        load_dotenv()
-        await bot.start(os.getenv("BOT_TOKEN"))
+        # Optional read-only stats API for dashboards (set STATS_API_PORT to enable; each guild publishes once loaded)
+        stats_server = None
+        if os.getenv("STATS_API_PORT"):
+            for partition in bot.partitions:
+                partition.stats_api = StatsPublisher(partition.store)
+            publishers = {partition.guild_id: partition.stats_api for partition in bot.partitions}
+            stats_server = HTTPServerThread(create_app(publishers), os.getenv("STATS_API_HOST", default_stats_api_host), int(os.getenv("STATS_API_PORT")))
+            stats_server.start()
+        # Metrics: count REST calls, sample event loop lag, and optionally serve /metrics (set METRICS_PORT to enable)
+        instrument_http(bot)
+        loop_lag_task = asyncio.create_task(measure_loop_lag())
+        metrics_server = None
+        if os.getenv("METRICS_PORT"):
+            metrics_server = HTTPServerThread(create_metrics_app(), os.getenv("METRICS_HOST", default_stats_api_host), int(os.getenv("METRICS_PORT")))
+            metrics_server.start()
+        warmup_task = asyncio.create_task(warm_up())
+        try:
+            await load_cogs()
+            await bot.start(os.getenv("BOT_TOKEN"))
+        finally:
+            # Save anything still waiting to be written before exiting
+            warmup_task.cancel()
+            loop_lag_task.cancel()
+            if metrics_server:
+                metrics_server.stop()
+            if stats_server:
+                stats_server.stop()
+            for partition in bot.partitions:
+                await partition.close()
+            language_executor.shutdown(wait=False, cancel_futures=True)
+            log_listener.stop()
 
 # This code runs only if main.py is executed directly.
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+# Overview
+# - Contains SuggestionAnalytics, running totals for /suggestion_stats (one per guild, created in main.py as partition.analytics)
+# - Every total is updated from the store's change records as they happen (new suggestion, vote, review), so reading them
+#   never scans the suggestions or their voter lists
+# - Keeps: counts per status (approval rate), suggestions per author, open suggestions ranked by net votes,
+#   everyone who has voted, and daily buckets of suggestions, votes & reviews
+# - Everything is derived from the stored (and archived) suggestions at start-up, in GuildPartition.start's single pass;
+#   the daily vote & review counts can't be derived (votes have no timestamps), so those are saved to
+#   data/analytics.json on shutdown
+
+# Libraries to import
+import asyncio
+import bisect
+import datetime
+import json
+import os
+from utils.votes import TICK, CROSS
+from utils.suggestion_management import write_file
+
+# File where the daily vote & review counts are kept between restarts
+analytics_file = "data/analytics.json"
+
+discord_epoch = 1420070400000   # Milliseconds between the Unix epoch & the first Discord snowflake
+daily_bucket_days = 90          # Days of daily buckets kept
+vote_weights = {TICK: 1, CROSS: -1}
+
+# Unix time a Discord snowflake ID (e.g. a suggestion's message ID) was created
+def snowflake_time(snowflake: int):
+    return ((snowflake >> 22) + discord_epoch) / 1000
+
+# Day (YYYY-MM-DD, UTC) a Discord snowflake ID was created
+def snowflake_day(snowflake: int):
+    return datetime.datetime.fromtimestamp(snowflake_time(snowflake), datetime.timezone.utc).date().isoformat()
+
+def today():
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+# Keys ranked by score, highest first; updates are a binary search & list insert, reading the top N is a slice
+class Ranking:
+    def __init__(self):
+        self._scores = {}       # Key -> score
+        self._order = []        # (-score, key), sorted
+
+    def set(self, key, score: int):
+        self.remove(key)
+        self._scores[key] = score
+        bisect.insort(self._order, (-score, key))
+
+    def add(self, key, amount: int):
+        self.set(key, self._scores.get(key, 0) + amount)
+
+    def remove(self, key):
+        score = self._scores.pop(key, None)
+        if score is not None:
+            del self._order[bisect.bisect_left(self._order, (-score, key))]
+
+    def get(self, key, default=None):
+        return self._scores.get(key, default)
+
+    # [(key, score)] of the n highest scores
+    def top(self, n: int):
+        return [(key, -score) for score, key in self._order[:n]]
+
+    def __contains__(self, key):
+        return key in self._scores
+
+    def __len__(self):
+        return len(self._scores)
+
+# Incrementally maintained suggestion & voting statistics
+class SuggestionAnalytics:
+    def __init__(self, store, path: str = analytics_file):
+        self.store = store
+        self.path = path
+        self.status_counts = {}         # Status -> number of suggestions
+        self.authors = Ranking()        # Author ID -> number of suggestions
+        self.open_net_votes = Ranking() # Pending suggestion ID -> ticks minus crosses
+        self.voters = set()             # Every user who has voted
+        self.daily = {}                 # Day -> {"suggestions", "votes", "approved", "rejected"}
+        self.total_votes = 0            # Votes currently held by all suggestions
+        self._author_counts = {}
+        store.add_listener(self._on_change)
+
+    # Start a rebuild from the saved daily counts (GuildPartition.start then streams every suggestion through load())
+    async def reset_from_saved(self):
+        saved = await asyncio.to_thread(self._read_saved)
+        self.reset(saved.get("daily", {}))
+
+    def _read_saved(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    # Save the daily counts (called on shutdown, from a worker thread)
+    def save(self):
+        write_file(self.path, json.dumps({"daily": self.daily}, indent=4))
+
+    # A rebuild is reset(), load() for each suggestion (one at a time, so they can be streamed), then finish_load()
+    def reset(self, saved_daily: dict = None):
+        self.status_counts = {}
+        self.authors = Ranking()
+        self.open_net_votes = Ranking()
+        self.voters = set()
+        self.total_votes = 0
+        self.daily = {day: dict(bucket, suggestions=0) for day, bucket in (saved_daily or {}).items()}
+        self._author_counts = {}    # Ranked once loading is done (cheaper than updating the ranking per suggestion)
+
+    def load(self, suggestion: dict):
+        self.status_counts[suggestion["status"]] = self.status_counts.get(suggestion["status"], 0) + 1
+        self._author_counts[suggestion["author_id"]] = self._author_counts.get(suggestion["author_id"], 0) + 1
+        votes = suggestion["votes"]
+        for choice in (TICK, CROSS):
+            self.voters.update(votes.voters(choice))
+            self.total_votes += votes.count(choice)
+        if suggestion["status"] == "pending":
+            self.open_net_votes.set(suggestion["id"], votes.count(TICK) - votes.count(CROSS))
+        self._bucket(snowflake_day(suggestion["message_id"]))["suggestions"] += 1
+
+    def finish_load(self):
+        for author_id, count in self._author_counts.items():
+            self.authors.set(author_id, count)
+        self._author_counts = {}
+        self._trim_daily()
+
+    # Store listener: apply one change to the totals
+    def _on_change(self, record: dict):
+        op = record["op"]
+        if op == "create":
+            suggestion = record["suggestion"]
+            self.status_counts[suggestion["status"]] = self.status_counts.get(suggestion["status"], 0) + 1
+            self.authors.add(suggestion["author_id"], 1)
+            if suggestion["status"] == "pending":
+                self.open_net_votes.set(suggestion["id"], 0)
+            self._bucket(snowflake_day(suggestion["message_id"]))["suggestions"] += 1
+        elif op == "vote_add":
+            self.voters.add(record["user_id"])
+            change = vote_weights[record["choice"]] - vote_weights.get(record["previous"], 0)
+            if record["previous"] is None:
+                self.total_votes += 1
+                self._bucket(today())["votes"] += 1
+            if record["id"] in self.open_net_votes:
+                self.open_net_votes.add(record["id"], change)
+        elif op == "vote_remove":
+            self.total_votes -= 1
+            if record["id"] in self.open_net_votes:
+                self.open_net_votes.add(record["id"], -vote_weights[record["choice"]])
+        elif op == "status":
+            previous = record["previous"]
+            self.status_counts[previous] = self.status_counts.get(previous, 1) - 1
+            self.status_counts[record["status"]] = self.status_counts.get(record["status"], 0) + 1
+            if record["status"] != "pending":
+                self.open_net_votes.remove(record["id"])
+            if record["status"] in ("approved", "rejected"):
+                self._bucket(today())[record["status"]] += 1
+
+    # Get (or start) the bucket for a day
+    def _bucket(self, day: str):
+        bucket = self.daily.get(day)
+        if bucket is None:
+            bucket = self.daily[day] = {"suggestions": 0, "votes": 0, "approved": 0, "rejected": 0}
+            if len(self.daily) > daily_bucket_days:
+                self._trim_daily()
+        return bucket
+
+    # Keep only the most recent daily_bucket_days days
+    def _trim_daily(self):
+        for day in sorted(self.daily)[:-daily_bucket_days]:
+            del self.daily[day]
+
+    # --- Reads (none of these scan the suggestions) ---
+
+    # Share of reviewed suggestions that were approved (None before any review)
+    def approval_rate(self):
+        approved = self.status_counts.get("approved", 0)
+        reviewed = approved + self.status_counts.get("rejected", 0)
+        return approved / reviewed if reviewed else None
+
+    # [(suggestion ID, net votes)] of the most-supported open suggestions
+    def top_open(self, n: int = 5):
+        return self.open_net_votes.top(n)
+
+    # [(author ID, suggestions)] of the most active suggesters
+    def top_authors(self, n: int = 5):
+        return self.authors.top(n)
+
+    # [(day, bucket)] for the last `days` days, oldest first (days without activity included)
+    def recent_days(self, days: int = 7):
+        end = datetime.datetime.now(datetime.timezone.utc).date()
+        empty = {"suggestions": 0, "votes": 0, "approved": 0, "rejected": 0}
+        return [
+            (day, self.daily.get(day, empty))
+            for day in ((end - datetime.timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1))
+        ]
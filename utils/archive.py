@@ -0,0 +1,189 @@
+# Overview
+# - Contains SuggestionArchive, the cold tier of the suggestions store (data/archive.gz)
+# - Approved & rejected suggestions can never be voted on again, so the store moves them out of the working set
+#   into this append-only archive; the working file (or database) only keeps pending suggestions
+# - Each batch of archived suggestions is appended as gzip members (JSON lines) of at most member_size suggestions,
+#   so reading one suggestion back or streaming the whole archive (exports) only ever decodes one small member at a time
+# - An index of suggestion ID -> (offset, length, status) is kept in memory and in data/archive.index, so one suggestion
+#   can be read back (e.g. for /votes) by decompressing just its member
+# - Run this file directly to split an existing suggestions.json into the two tiers:
+#   python -m utils.archive [data/suggestions.json]
+
+# Libraries to import
+import gzip
+import json
+import os
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from utils.votes import VoteSet, encode_votes
+from utils.suggestion_management import load_data, write_file, data_file, closed_statuses
+
+# Archive files
+archive_file = "data/archive.gz"
+archive_index_file = "data/archive.index"
+
+# Archive settings
+member_cache_size = 16      # Recently read archive members kept decoded in memory
+member_size = 500           # Max suggestions per archive member
+
+# Append-only, compressed archive of closed suggestions
+class SuggestionArchive:
+    def __init__(self, path: str = archive_file, index_path: str = archive_index_file):
+        self.path = path
+        self.index_path = index_path
+        self._index = {}                    # Suggestion ID -> (offset, length, status)
+        self._members = OrderedDict()       # Offset -> {suggestion ID: suggestion} (recently read members)
+        self._lock = threading.Lock()       # Reads & appends run in worker threads
+
+    # Read the index (and recover members appended after the last index write, e.g. after a crash)
+    # recover=False only reads the index and never writes, for reading the archive while the bot is running (export.py)
+    def load(self, recover: bool = True):
+        self._index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 4:
+                        self._index[int(parts[0])] = (int(parts[1]), int(parts[2]), parts[3])
+        if recover:
+            self._recover_tail()
+
+    # Index any members written to the archive after the last index entry
+    def _recover_tail(self):
+        if not os.path.exists(self.path):
+            return
+        end = max((offset + length for offset, length, _ in self._index.values()), default=0)
+        with open(self.path, "rb") as f:
+            f.seek(end)
+            tail = f.read()
+        entries = []
+        while tail:
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                text = decompressor.decompress(tail)
+            except zlib.error:
+                break   # Half-written member from a crash (truncated below)
+            if not decompressor.eof:
+                break
+            length = len(tail) - len(decompressor.unused_data)
+            for line in text.decode("utf-8").splitlines():
+                suggestion = json.loads(line)
+                entries.append((suggestion["id"], end, length, suggestion["status"]))
+            end += length
+            tail = decompressor.unused_data
+        if entries:
+            self._write_index(entries)
+        # Drop any half-written member so the next append starts on a clean boundary
+        if os.path.getsize(self.path) > end:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+
+    def _write_index(self, entries):
+        with open(self.index_path, "a") as f:
+            for suggestion_id, offset, length, status in entries:
+                f.write(f"{suggestion_id} {offset} {length} {status}\n")
+                self._index[suggestion_id] = (offset, length, status)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Serialise closed suggestions into the text of members of at most member_size suggestions:
+    # [(JSON lines, [(suggestion ID, status)])]
+    # The store calls this on the event loop, so the suggestions can't change mid-dump (e.g. a language tag arriving)
+    def encode(self, suggestions):
+        members = []
+        for start in range(0, len(suggestions), member_size):
+            batch = suggestions[start:start + member_size]
+            text = "".join(json.dumps(suggestion, default=encode_votes) + "\n" for suggestion in batch)
+            members.append((text, [(suggestion["id"], suggestion["status"]) for suggestion in batch]))
+        return members
+
+    # Append closed suggestions (encoded on the calling thread, so only for suggestions nothing else is changing)
+    def append(self, suggestions):
+        self.append_encoded(self.encode(suggestions))
+
+    # Compress & append members from encode() (runs in a worker thread)
+    # The members are written & synced before the index, so a crash in between is repaired by load()
+    def append_encoded(self, members):
+        if not members:
+            return
+        with self._lock:
+            entries = []
+            with open(self.path, "ab") as f:
+                for text, suggestions in members:
+                    member = gzip.compress(text.encode("utf-8"))
+                    offset = f.tell()
+                    f.write(member)
+                    entries.extend((suggestion_id, offset, len(member), status) for suggestion_id, status in suggestions)
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_index(entries)
+
+    # Read one archived suggestion (runs in a worker thread); None if it isn't archived
+    def get(self, suggestion_id: int):
+        entry = self._index.get(suggestion_id)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        with self._lock:
+            member = self._members.get(offset)
+            if member is None:
+                member = self._read_member(offset, length)
+                self._members[offset] = member
+                if len(self._members) > member_cache_size:
+                    self._members.popitem(last=False)
+            else:
+                self._members.move_to_end(offset)
+            return member.get(suggestion_id)
+
+    def _read_member(self, offset: int, length: int):
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            text = gzip.decompress(f.read(length)).decode("utf-8")
+        member = {}
+        for line in text.splitlines():
+            suggestion = json.loads(line)
+            suggestion["votes"] = VoteSet.from_json(suggestion["votes"])
+            member[suggestion["id"]] = suggestion
+        return member
+
+    # Read every archived suggestion, oldest first, one member at a time (runs in a worker thread; e.g. for stats & exports)
+    # match(suggestion ID, status) picks which suggestions to read; members holding none of them aren't even decompressed
+    def iter_all(self, match=None):
+        with self._lock:
+            index = dict(self._index)   # Appends may run meanwhile
+        offsets = sorted({
+            (offset, length) for suggestion_id, (offset, length, status) in index.items()
+            if match is None or match(suggestion_id, status)
+        })
+        for offset, length in offsets:
+            for suggestion_id, suggestion in self._read_member(offset, length).items():
+                # A suggestion archived twice (e.g. after a crash) is read from its newest member only
+                if index.get(suggestion_id, (None,))[0] == offset and (match is None or match(suggestion_id, suggestion["status"])):
+                    yield suggestion
+
+    # Status of an archived suggestion (None if it isn't archived)
+    def status_of(self, suggestion_id: int):
+        entry = self._index.get(suggestion_id)
+        return entry[2] if entry else None
+
+    def __contains__(self, suggestion_id: int):
+        return suggestion_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+# One-shot migration: move the closed suggestions of a suggestions.json into the archive
+def split_data_file(path: str, archive: SuggestionArchive):
+    archive.load()
+    data = load_data(path)
+    closed = [suggestion for suggestion in data["suggestions"] if suggestion["status"] in closed_statuses]
+    archive.append([suggestion for suggestion in closed if suggestion["id"] not in archive])
+    data["suggestions"] = [suggestion for suggestion in data["suggestions"] if suggestion["status"] not in closed_statuses]
+    write_file(path, json.dumps(data, indent=4, default=encode_votes))
+    print(f"Archived {len(closed)} closed suggestions from {path}; {len(data['suggestions'])} pending suggestions remain")
+
+# This code runs only if the file is executed directly (python -m utils.archive)
+if __name__ == "__main__":
+    split_data_file(sys.argv[1] if len(sys.argv) > 1 else data_file, SuggestionArchive())
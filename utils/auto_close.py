@@ -0,0 +1,160 @@
+# Overview
+# - Contains AutoCloseScheduler, which applies a guild's auto-close rules (one per guild with rules, created in main.py
+#   as partition.auto_close; the rules are set in data/guilds.json, see utils/guilds.py):
+#   - auto_close_days: pending suggestions are closed (as auto_close_status) once they are that many days old
+#   - review_threshold: pending suggestions are flagged for staff review once their net votes (ticks minus crosses) reach it
+# - Open suggestions are kept in a heap keyed by their deadline (from the suggestion message's creation time), so the
+#   scheduler sleeps until the earliest deadline instead of scanning the store; suggestions closed by staff are
+#   skipped when their deadline comes up
+# - Vote thresholds are checked as votes arrive (cogs/events.py calls check_votes), one suggestion at a time
+# - Everything due at once is handed to the sweep callback as one batch (cogs/admin_controls.py closes them with the
+#   usual review embeds and reposts the panel once)
+# - Flagged suggestions are saved to data/auto_close.json on shutdown so they aren't flagged again after a restart
+
+# Libraries to import
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from utils.votes import TICK, CROSS
+from utils.analytics import snowflake_time
+from utils.suggestion_management import write_file
+
+log = logging.getLogger(__name__)
+
+# File where the flagged suggestions are kept between restarts
+auto_close_file = "data/auto_close.json"
+
+sweep_limit = 50            # Max suggestions closed per sweep (the rest follow in the next sweep straight away)
+retry_delay = 3600          # Seconds before retrying a suggestion that could not be closed
+
+# Deadline-ordered auto-closing & vote-threshold flagging of one guild's pending suggestions
+class AutoCloseScheduler:
+    def __init__(self, store, config, sweep, path: str = auto_close_file):
+        self.store = store
+        self.path = path
+        self.close_after = config.auto_close_days * 86400 if config.auto_close_days is not None else None
+        self.review_threshold = config.review_threshold
+        self.sweep = sweep              # async sweep(due suggestion IDs, flagged suggestion IDs) -> IDs to retry later
+        self._deadlines = []            # Heap of (deadline, suggestion ID)
+        self._flagged = set()           # Pending suggestions already flagged
+        self._to_flag = {}              # Suggestions to flag in the next sweep (dict used as an ordered set)
+        self._wake = asyncio.Event()    # Set when the next sweep may be due earlier than planned
+        self._task = None
+        store.add_listener(self._on_change)
+
+    # Deadline of a suggestion (Unix time)
+    def deadline_of(self, suggestion: dict):
+        return snowflake_time(suggestion["message_id"]) + self.close_after
+
+    def net_votes(self, suggestion: dict):
+        return suggestion["votes"].count(TICK) - suggestion["votes"].count(CROSS)
+
+    # Build the heap from the pending suggestions (once, at start-up) and start sweeping
+    async def start(self):
+        pending = self.store.with_status("pending")
+        if self.close_after is not None:
+            self._deadlines = [(self.deadline_of(suggestion), suggestion["id"]) for suggestion in pending]
+            heapq.heapify(self._deadlines)
+        if self.review_threshold is not None:
+            saved = await asyncio.to_thread(self._read_saved)
+            pending_ids = {suggestion["id"] for suggestion in pending}
+            self._flagged = {suggestion_id for suggestion_id in saved.get("flagged", []) if suggestion_id in pending_ids}
+            # Suggestions that reached the threshold while the bot was offline (or before the rule was set)
+            for suggestion in pending:
+                self.check_votes(suggestion)
+        self._task = asyncio.create_task(self._run())
+
+    # Stop sweeping & save the flagged suggestions
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self.review_threshold is not None:
+            await asyncio.to_thread(self.save)
+
+    def _read_saved(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def save(self):
+        write_file(self.path, json.dumps({"flagged": sorted(self._flagged)}))
+
+    # Store listener: schedule new suggestions & forget closed ones (closed ones left in the heap are skipped when due)
+    def _on_change(self, record: dict):
+        op = record["op"]
+        if op == "create":
+            suggestion = record["suggestion"]
+            if self.close_after is not None and suggestion["status"] == "pending":
+                self._schedule(self.deadline_of(suggestion), suggestion["id"])
+        elif op == "status" and record["status"] != "pending":
+            self._flagged.discard(record["id"])
+            self._to_flag.pop(record["id"], None)
+
+    def _schedule(self, deadline: float, suggestion_id: int):
+        heapq.heappush(self._deadlines, (deadline, suggestion_id))
+        if self._deadlines[0][1] == suggestion_id:
+            self._wake.set()    # Earlier than the deadline being waited for
+
+    # Flag a suggestion if its net votes have reached the threshold (called whenever its votes change)
+    def check_votes(self, suggestion: dict):
+        if self.review_threshold is None or suggestion["status"] != "pending" or suggestion["id"] in self._flagged:
+            return
+        if self.net_votes(suggestion) >= self.review_threshold:
+            self._flagged.add(suggestion["id"])
+            self._to_flag[suggestion["id"]] = None
+            self._wake.set()
+
+    # Pop the pending suggestions whose deadline has passed (at most sweep_limit)
+    def _pop_due(self, now: float):
+        due = []
+        while self._deadlines and self._deadlines[0][0] <= now and len(due) < sweep_limit:
+            _, suggestion_id = heapq.heappop(self._deadlines)
+            suggestion = self.store.get(suggestion_id)
+            if suggestion is not None and suggestion["status"] == "pending":
+                due.append(suggestion_id)
+        return due
+
+    # Seconds until the earliest deadline (None if nothing is scheduled)
+    def next_wait(self):
+        if not self._deadlines:
+            return None
+        return max(0.0, self._deadlines[0][0] - time.time())
+
+    # Sleep until something is due, then hand everything due to the sweep callback as one batch
+    async def _run(self):
+        while True:
+            wait = self.next_wait()
+            if not self._to_flag and wait != 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            due = self._pop_due(time.time())
+            flagged = list(self._to_flag)
+            self._to_flag.clear()
+            if not due and not flagged:
+                continue
+            try:
+                retry = await self.sweep(due, flagged)
+            except Exception:
+                log.exception("Error in auto-close sweep")
+                retry = due
+                # Not flagged after all: the next vote on them (or the next start-up) flags them again
+                self._flagged.difference_update(flagged)
+            for suggestion_id in retry or ():
+                heapq.heappush(self._deadlines, (time.time() + retry_delay, suggestion_id))
+
+    # --- Reads ---
+
+    # Number of scheduled deadlines (including suggestions closed since, which are skipped when due)
+    def __len__(self):
+        return len(self._deadlines)
@@ -0,0 +1,48 @@
+# Overview
+# - Contains sync_commands, which only syncs the slash command tree with Discord when it has changed
+# - A sync is a rate-limited global REST call, so instead of syncing on every start-up (or every reconnect),
+#   the tree is fingerprinted (a hash of the JSON Discord is sent) and the hash of the last successful sync
+#   is kept in data/command_tree.hash
+# - Set FORCE_COMMAND_SYNC=1 in main.py's environment to sync anyway (e.g. after commands were changed by hand)
+
+# Libraries to import
+import hashlib
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# File holding the fingerprint of the last synced command tree
+command_tree_file = "data/command_tree.hash"
+
+# Hash of the global commands as they would be sent to Discord (and the application they belong to)
+def tree_fingerprint(tree, application_id: int):
+    commands = sorted((command.to_dict(tree) for command in tree.get_commands()), key=lambda command: (command["type"], command["name"]))
+    payload = json.dumps({"application_id": application_id, "commands": commands}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def read_fingerprint(path: str = command_tree_file):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return f.read().strip()
+
+# Save the fingerprint (to a temporary file first, swapped in; not store data, so not counted in the store metrics)
+def write_fingerprint(fingerprint: str, path: str = command_tree_file):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        f.write(fingerprint)
+    os.replace(temp_path, path)
+
+# Sync the command tree if it differs from the last synced one; returns whether it was synced
+async def sync_commands(tree, application_id: int, path: str = command_tree_file, force: bool = False):
+    fingerprint = tree_fingerprint(tree, application_id)
+    if not force and read_fingerprint(path) == fingerprint:
+        log.info("Command tree unchanged (%s), skipping sync", fingerprint[:12])
+        return False
+    await tree.sync()
+    # Only remembered once Discord has accepted it, so a failed sync is retried on the next start-up
+    write_fingerprint(fingerprint, path)
+    log.info("Command tree synced (%s)", fingerprint[:12])
+    return True
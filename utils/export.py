@@ -0,0 +1,136 @@
+# Overview
+# - Contains the streaming export of a guild's suggestions & votes, used by /export_suggestions and export.py
+# - The export is a chain of generators: suggestions (archive, then working set) -> rows -> encoded lines -> byte chunks
+#   -> optional gzip, so only one archive member and one output chunk are in memory at a time, whatever the history size
+# - Two kinds of rows: "suggestions" (one per suggestion, with its vote counts) and "votes" (one per vote,
+#   flattened to suggestion_id, user_id, choice)
+# - Two formats: NDJSON (one JSON object per line) and CSV (with a header row)
+# - Suggestions can be filtered by status and by ID range; archive members holding no matching suggestion are never read
+
+# Libraries to import
+import csv
+import io
+import json
+import zlib
+from utils.votes import VoteSet, TICK, CROSS, CHOICES
+
+# Export settings
+export_rows = ("suggestions", "votes")
+export_formats = ("ndjson", "csv")
+suggestion_fields = ["id", "status", "author_id", "message_id", "content", "staff_response", "language", "ticks", "crosses"]
+vote_fields = ["suggestion_id", "user_id", "choice"]
+chunk_size = 64 * 1024      # Bytes of output gathered before a chunk is written (or compressed)
+
+# Copy of the working set's suggestions, so the export can run in a worker thread while votes keep arriving
+# (the working set only holds pending suggestions, so this is already in memory; the archive is streamed instead)
+def snapshot_live(store):
+    return [
+        dict(suggestion, votes=VoteSet(list(suggestion["votes"].voters(TICK)), list(suggestion["votes"].voters(CROSS))))
+        for suggestion in store.data["suggestions"]
+    ]
+
+# Suggestions to export, archived ones first (oldest first), then the working set
+def iter_suggestions(live, archive=None, status: str = None, min_id: int = None, max_id: int = None):
+    def match(suggestion_id: int, suggestion_status: str):
+        return (
+            (status is None or suggestion_status == status)
+            and (min_id is None or suggestion_id >= min_id)
+            and (max_id is None or suggestion_id <= max_id)
+        )
+
+    if archive is not None:
+        # A suggestion archived after the snapshot was taken is exported from the snapshot only
+        live_ids = {suggestion["id"] for suggestion in live}
+        for suggestion in archive.iter_all(match):
+            if suggestion["id"] not in live_ids:
+                yield suggestion
+    for suggestion in live:
+        if match(suggestion["id"], suggestion["status"]):
+            yield suggestion
+
+# One row per suggestion
+def suggestion_rows(suggestions):
+    for suggestion in suggestions:
+        votes = suggestion["votes"]
+        yield {
+            "id": suggestion["id"],
+            "status": suggestion["status"],
+            "author_id": suggestion["author_id"],
+            "message_id": suggestion["message_id"],
+            "content": suggestion["content"],
+            "staff_response": suggestion.get("staff_response"),
+            "language": suggestion.get("language"),
+            "ticks": votes.count(TICK),
+            "crosses": votes.count(CROSS)
+        }
+
+# One row per vote
+def vote_rows(suggestions):
+    for suggestion in suggestions:
+        for choice in CHOICES:
+            for user_id in suggestion["votes"].voters(choice):
+                yield {"suggestion_id": suggestion["id"], "user_id": user_id, "choice": choice}
+
+def encode_ndjson(rows, fields):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+def encode_csv(rows, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+# Gather encoded lines into UTF-8 chunks of about chunk_size bytes
+def chunked(lines):
+    parts = []
+    length = 0
+    for line in lines:
+        data = line.encode("utf-8")
+        parts.append(data)
+        length += len(data)
+        if length >= chunk_size:
+            yield b"".join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield b"".join(parts)
+
+# Compress chunks into a single gzip stream
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)     # 31: gzip header & trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# The export as byte chunks (rows: "suggestions" or "votes", file_format: "ndjson" or "csv")
+def export_chunks(suggestions, rows: str = "suggestions", file_format: str = "ndjson", compress: bool = False):
+    if rows not in export_rows or file_format not in export_formats:
+        raise ValueError(f"Unknown export: {rows} as {file_format}")
+    if rows == "votes":
+        records, fields = vote_rows(suggestions), vote_fields
+    else:
+        records, fields = suggestion_rows(suggestions), suggestion_fields
+    encode = encode_csv if file_format == "csv" else encode_ndjson
+    chunks = chunked(encode(records, fields))
+    return gzipped(chunks) if compress else chunks
+
+# File name for an export, e.g. votes.csv.gz
+def export_filename(rows: str, file_format: str, compress: bool = False):
+    return f"{rows}.{file_format}" + (".gz" if compress else "")
+
+# Write the chunks to a binary file object (runs in a worker thread); returns the bytes written
+def write_export(f, chunks):
+    size = 0
+    for chunk in chunks:
+        f.write(chunk)
+        size += len(chunk)
+    return size
@@ -0,0 +1,236 @@
+# Overview
+# - Contains the per-guild settings (suggestions channel, reviewed channel & vote emojis) and GuildPartition,
+#   everything the bot keeps for one guild: its own store (with its own suggestion IDs & panel), panel manager, locks,
+#   duplicate-detection index, search index, language classifier & analytics
+# - The guilds are read once at start-up from data/guilds.json into GuildPartitions (created in main.py as bot.partitions),
+#   so handlers find their guild with a dictionary lookup by guild or channel ID
+# - Each guild's files live in its own data folder, so a vote in one guild never rewrites another guild's data
+# - Partitions are loaded in the background while the bot connects (main.py's warm-up); handlers wait for their
+#   partition's ready event, and interactions that can't wait are told the bot is still starting up
+# - Without data/guilds.json the bot serves a single guild with the built-in TE Server settings, using the data folder
+#   as before (that guild answers to every guild ID)
+# data/guilds.json:
+#   {"guilds": [{"guild_id": 123, "suggestions_channel": 456, "reviewed_channel": 789,
+#                "tick_emoji": "<:Tick:111>", "cross_emoji": "✅", "data_dir": "data/guilds/123",
+#                "auto_close_days": 30, "auto_close_status": "rejected", "review_threshold": 10, "flag_channel": 999}]}
+#   (reviewed_channel defaults to the suggestions channel, the emojis to the TE ones & data_dir to data/guilds/<guild_id>)
+#   Auto-close rules (see utils/auto_close.py) are off unless set: auto_close_days closes pending suggestions that old
+#   as auto_close_status (default rejected); review_threshold flags suggestions reaching that many net votes in
+#   flag_channel (default the reviewed channel)
+
+# Libraries to import
+import asyncio
+import json
+import logging
+import os
+from utils.votes import TICK, CROSS
+from utils.locks import KeyedLocks
+from utils.suggestion_management import SuggestionStore, data_file, journal_file
+from utils.sqlite_store import SQLiteSuggestionStore, sqlite_file
+from utils.archive import SuggestionArchive, archive_file, archive_index_file
+
+log = logging.getLogger(__name__)
+
+# File listing the guilds the bot serves
+guilds_file = "data/guilds.json"
+
+# Built-in settings (TE Server), used for the single guild when there is no guilds file
+default_suggestions_channel = 1390343546791268507   # TE Server - #suggestions channel
+default_reviewed_channel = 1390343546791268507      # TE Server - #suggestions channel
+default_tick_emoji = "<:Tick:1422628423620366469>"  # emoji from TE Discord
+default_cross_emoji = "<:Cross:1422628421913149440>" # emoji from TE Discord
+default_data_dir = "data"
+
+# Seconds an interaction waits for its guild to finish loading before being told to try again
+# (Discord expects an answer within 3 seconds)
+startup_wait = 2.0
+
+# Seconds between saves of a guild's similarity index (it is also saved on shutdown)
+similarity_save_interval = 300
+
+# Shard that receives a guild's events (Discord's formula)
+def shard_of(guild_id: int, shard_count: int):
+    return (guild_id >> 22) % shard_count
+
+# ID of a custom emoji like "<:Tick:123>" (None for a Unicode emoji like "✅")
+def emoji_id(emoji: str):
+    if emoji.startswith("<") and emoji.endswith(">"):
+        return int(emoji[:-1].rsplit(":", 1)[1])
+    return None
+
+# Settings of one guild
+class GuildConfig:
+    def __init__(self, guild_id: int = None, suggestions_channel: int = default_suggestions_channel, reviewed_channel: int = None,
+                 tick_emoji: str = default_tick_emoji, cross_emoji: str = default_cross_emoji, data_dir: str = None,
+                 auto_close_days: float = None, auto_close_status: str = "rejected", review_threshold: int = None, flag_channel: int = None):
+        self.guild_id = guild_id            # None for the built-in single guild (matches any guild)
+        self.suggestions_channel = suggestions_channel
+        self.reviewed_channel = reviewed_channel or suggestions_channel
+        self.tick_emoji = tick_emoji
+        self.cross_emoji = cross_emoji
+        self.data_dir = data_dir or (os.path.join(default_data_dir, "guilds", str(guild_id)) if guild_id else default_data_dir)
+        self.vote_choices = {tick_emoji: TICK, cross_emoji: CROSS}     # Reaction emoji -> vote choice
+        self.choice_emojis = {TICK: tick_emoji, CROSS: cross_emoji}    # Vote choice -> reaction emoji
+        self.auto_close_days = auto_close_days
+        self.auto_close_status = auto_close_status
+        self.review_threshold = review_threshold
+        self.flag_channel = flag_channel or self.reviewed_channel
+
+    # Whether any auto-close rule is set
+    @property
+    def auto_close(self):
+        return self.auto_close_days is not None or self.review_threshold is not None
+
+    # Where this guild keeps one of the data files (e.g. data/suggestions.json -> data/guilds/123/suggestions.json)
+    def path(self, default_path: str):
+        return os.path.join(self.data_dir, os.path.basename(default_path))
+
+    # Emoji to react with for a vote choice (custom emojis are looked up in the bot's cache)
+    def reaction(self, bot, choice: str):
+        emoji = self.choice_emojis[choice]
+        custom_id = emoji_id(emoji)
+        return bot.get_emoji(custom_id) if custom_id else emoji
+
+# Read the guilds file (a single built-in guild if it doesn't exist)
+def load_guild_configs(path: str = guilds_file):
+    if not os.path.exists(path):
+        return [GuildConfig(reviewed_channel=default_reviewed_channel)]
+    with open(path, "r") as f:
+        entries = json.load(f)["guilds"]
+    configs = []
+    for entry in entries:
+        if "guild_id" not in entry or "suggestions_channel" not in entry:
+            raise ValueError(f"{path}: every guild needs a guild_id and a suggestions_channel")
+        configs.append(GuildConfig(**entry))
+        if configs[-1].auto_close_status not in ("approved", "rejected"):
+            raise ValueError(f"{path}: auto_close_status must be approved or rejected")
+    if len({config.guild_id for config in configs}) != len(configs):
+        raise ValueError(f"{path}: a guild is listed more than once")
+    if len({config.suggestions_channel for config in configs}) != len(configs):
+        raise ValueError(f"{path}: two guilds share a suggestions channel")
+    return configs
+
+# Create the suggestions store of a guild, with its files in the guild's data folder
+# storage_mode: "json" rewrites suggestions.json, "journal" appends each change to suggestions.journal,
+# "sqlite" keeps suggestions & votes in an SQLite database; settings go to the store (e.g. flush_interval)
+def create_store(config: GuildConfig, storage_mode: str = "json", archive_closed: bool = True, sqlite_name: str = sqlite_file, **settings):
+    archive = SuggestionArchive(config.path(archive_file), config.path(archive_index_file)) if archive_closed else None
+    if storage_mode == "sqlite":
+        settings.pop("compact_threshold", None)     # Journal setting
+        return SQLiteSuggestionStore(db_path=config.path(sqlite_name), archive=archive, **settings)
+    return SuggestionStore(
+        path=config.path(data_file), journal=storage_mode == "journal", journal_path=config.path(journal_file), archive=archive, **settings
+    )
+
+# Everything the bot keeps for one guild
+class GuildPartition:
+    def __init__(self, config: GuildConfig, store, similarity, analytics, search, languages):
+        self.config = config
+        self.store = store                  # The guild's suggestions (own IDs & panel)
+        self.similarity = similarity
+        self.analytics = analytics
+        self.search = search
+        self.languages = languages
+        self.locks = KeyedLocks()           # Per-suggestion locks (votes & reviews of one suggestion are applied one at a time)
+        self.panel = None                   # PanelManager (set by main.py, which owns the cogs)
+        self.stats_api = None               # StatsPublisher, if the stats API is enabled
+        self.auto_close = None              # AutoCloseScheduler, if the guild has auto-close rules (set by main.py)
+        self.ready = asyncio.Event()        # Set once the guild's data is loaded
+        self._save_task = None              # Periodic save of the similarity index
+
+    @property
+    def guild_id(self):
+        return self.config.guild_id
+
+    # Load the guild's data & start its background work
+    async def start(self):
+        os.makedirs(self.config.data_dir, exist_ok=True)
+        await self.store.start()
+        # One pass over every suggestion feeds the analytics, search index, similarity index & stats API; the archive
+        # is streamed one member at a time, so it is never held in memory at once
+        await self.analytics.reset_from_saved()
+        self.search.reset()
+        await asyncio.to_thread(self.similarity.load)
+
+        def load(suggestion: dict, archived: bool):
+            self.analytics.load(suggestion)
+            self.search.load(suggestion)
+            self.similarity.add(suggestion["id"], suggestion["content"])    # Only embeds suggestions saved since
+            if archived and self.stats_api is not None:
+                self.stats_api.add_archived(suggestion)
+
+        await self.store.for_each_suggestion(load)
+        self.analytics.finish_load()
+        self.search.finish_load()
+        self.languages.start()
+        self._save_task = asyncio.create_task(self._save_loop())
+        if self.auto_close is not None:
+            await self.auto_close.start()
+        if self.stats_api is not None:
+            await self.stats_api.publish()
+        self.ready.set()
+
+    # Stop background work & save everything still in memory (nothing to do if it never finished loading)
+    async def close(self):
+        if not self.ready.is_set():
+            return
+        self.languages.stop()
+        self._save_task.cancel()
+        if self.auto_close is not None:
+            await self.auto_close.stop()
+        await self.store.close()
+        await asyncio.to_thread(self.similarity.save)
+        await asyncio.to_thread(self.analytics.save)
+
+    # Save the similarity index every few minutes, so a crash only loses the suggestions embedded since
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(similarity_save_interval)
+            try:
+                await asyncio.to_thread(self.similarity.save_if_changed)
+            except Exception:
+                log.exception("Error saving the similarity index of guild %s", self.guild_id)
+
+# Lookup of the guilds this process serves (by guild & by suggestions channel)
+class GuildPartitions:
+    def __init__(self, partitions=()):
+        self._by_guild = {}         # Guild ID -> partition
+        self._by_channel = {}       # Suggestions channel ID -> partition
+        self._fallback = None       # The built-in single guild, if that is what is running
+        for partition in partitions:
+            self.add(partition)
+
+    def add(self, partition: GuildPartition):
+        if partition.guild_id is None:
+            self._fallback = partition
+        else:
+            self._by_guild[partition.guild_id] = partition
+        self._by_channel[partition.config.suggestions_channel] = partition
+
+    # Partition of a guild (None if the guild isn't served)
+    def for_guild(self, guild_id: int):
+        return self._by_guild.get(guild_id, self._fallback)
+
+    # Partition whose suggestions channel this is (None for any other channel)
+    def for_channel(self, channel_id: int):
+        return self._by_channel.get(channel_id)
+
+    def __iter__(self):
+        return iter(self._by_channel.values())
+
+    def __len__(self):
+        return len(self._by_channel)
+
+# Partition for an interaction's guild, or None after telling the user the bot isn't set up there (or still starting up)
+async def partition_for(interaction):
+    partition = interaction.client.partitions.for_guild(interaction.guild_id)
+    if partition is None:
+        await interaction.response.send_message(f"{interaction.user.mention}, suggestions are not set up in this server.", ephemeral=True)
+        return None
+    if not partition.ready.is_set():
+        try:
+            await asyncio.wait_for(partition.ready.wait(), startup_wait)
+        except asyncio.TimeoutError:
+            await interaction.response.send_message(f"{interaction.user.mention}, the bot is still starting up. Please try again in a few seconds.", ephemeral=True)
+            return None
+    return partition
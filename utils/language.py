@@ -0,0 +1,111 @@
+# Overview
+# - Contains LanguageClassifier, which tags each suggestion with its detected language (one per guild, created in main.py as partition.languages)
+# - langdetect is slow & CPU-heavy, so it always runs in a worker thread, never on the event loop
+# - Results are cached by a hash of the suggestion text
+# - Suggestions saved before this existed are tagged in the background, a batch at a time
+# - Closed suggestions are tagged before the store moves them to the archive (which is never rewritten), so a suggestion
+#   closed before its tag or the backfill got to it is still archived with its language
+
+# Libraries to import
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from langdetect import DetectorFactory, detect
+from langdetect.lang_detect_exception import LangDetectException
+
+log = logging.getLogger(__name__)
+
+# Make langdetect give the same answer for the same text every time
+DetectorFactory.seed = 0
+
+# Classifier settings
+backfill_batch_size = 25        # Suggestions tagged per worker call during the background backfill
+language_cache_size = 10000     # Max cached results
+unknown_language = "unknown"    # Stored when the language can't be detected (e.g. only emojis or links)
+
+# Detect the language of some text (runs in the worker thread)
+def detect_language(text: str):
+    try:
+        return detect(text)
+    except LangDetectException:
+        return unknown_language
+
+# Detect the language of several texts in one go (runs in the worker thread)
+def detect_languages(texts):
+    return [detect_language(text) for text in texts]
+
+# Hash used as the cache key for a piece of text
+def content_hash(text: str):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# Tags suggestions with their language without blocking the event loop
+class LanguageClassifier:
+    def __init__(self, store, executor: ThreadPoolExecutor = None):
+        self.store = store
+        # Guilds share one worker thread (main.py passes it in and shuts it down); otherwise the classifier owns its own
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="langdetect")
+        self._cache = {}                # Content hash -> language
+        self._backfill_task = None
+        self._tasks = set()             # Running tag() tasks (kept so they aren't garbage collected)
+
+    # Start tagging existing suggestions in the background (and closed ones before they're archived)
+    def start(self):
+        self.store.before_archive = self.tag_untagged
+        self._backfill_task = asyncio.create_task(self.backfill())
+
+    # Stop the backfill and the worker thread (if it isn't shared)
+    def stop(self):
+        self.store.before_archive = None
+        if self._backfill_task:
+            self._backfill_task.cancel()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Detect the language of some text (cached)
+    async def classify(self, text: str):
+        key = content_hash(text)
+        language = self._cache.get(key)
+        if language is None:
+            language = await asyncio.get_running_loop().run_in_executor(self._executor, detect_language, text)
+            self._remember(key, language)
+        return language
+
+    # Detect a suggestion's language and save it on the suggestion
+    async def tag(self, suggestion: dict):
+        try:
+            self.store.set_language(suggestion, await self.classify(suggestion["content"]))
+        except Exception:
+            log.exception("Error detecting language of suggestion %s", suggestion["id"])
+
+    # Tag a suggestion in the background (for callers that shouldn't wait for the result)
+    def tag_later(self, suggestion: dict):
+        task = asyncio.create_task(self.tag(suggestion))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # Tag every suggestion that doesn't have a language yet, a batch at a time
+    async def backfill(self):
+        count = await self.tag_untagged(self.store.data["suggestions"])
+        if count:
+            log.info("Detected the language of %d existing suggestions", count)
+
+    # Tag the suggestions that don't have a language yet, a batch at a time; returns how many needed tagging
+    async def tag_untagged(self, suggestions):
+        untagged = [suggestion for suggestion in suggestions if not suggestion.get("language")]
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(untagged), backfill_batch_size):
+            batch = untagged[start:start + backfill_batch_size]
+            texts = [suggestion["content"] for suggestion in batch]
+            languages = await loop.run_in_executor(self._executor, detect_languages, texts)
+            for suggestion, text, language in zip(batch, texts, languages):
+                self._remember(content_hash(text), language)
+                self.store.set_language(suggestion, language)
+        return len(untagged)
+
+    # Add a result to the cache (dropping the oldest once full)
+    def _remember(self, key: str, language: str):
+        if len(self._cache) >= language_cache_size:
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = language
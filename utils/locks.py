@@ -0,0 +1,79 @@
+# Overview
+# - Contains KeyedLocks, one asyncio lock per key (e.g. per suggestion ID), shared by the cogs (one per guild, as partition.locks)
+# - Work on different keys runs fully in parallel, while work on the same key (e.g. a vote & an /approve of one suggestion)
+#   is applied one at a time
+# - Locks are created on first use and dropped as soon as nobody holds or waits for them, so idle keys cost nothing
+# Usage:
+#   async with partition.locks(suggestion["id"]):
+#       ... read, check & update the suggestion ...
+
+# Libraries to import
+import asyncio
+
+# Lock manager with one lock per key
+class KeyedLocks:
+    def __init__(self):
+        self._locks = {}    # Key -> [lock, number of tasks holding or waiting for it]
+
+    def __call__(self, key):
+        return _KeyedLock(self, key)
+
+    # Hold the locks of several keys at once (always taken in sorted order, so two callers can't deadlock)
+    def many(self, keys):
+        return _KeyedLocksGroup(self, sorted(set(keys)))
+
+    def __len__(self):
+        return len(self._locks)
+
+    async def _acquire(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_entry(key, entry, locked=False)
+            raise
+
+    def _release(self, key):
+        self._release_entry(key, self._locks[key], locked=True)
+
+    def _release_entry(self, key, entry, locked: bool):
+        if locked:
+            entry[0].release()
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[key]
+
+# async with handle for a single key
+class _KeyedLock:
+    def __init__(self, manager: KeyedLocks, key):
+        self._manager = manager
+        self._key = key
+
+    async def __aenter__(self):
+        await self._manager._acquire(self._key)
+
+    async def __aexit__(self, *exc_info):
+        self._manager._release(self._key)
+
+# async with handle for several keys
+class _KeyedLocksGroup:
+    def __init__(self, manager: KeyedLocks, keys):
+        self._manager = manager
+        self._keys = keys
+        self._held = []
+
+    async def __aenter__(self):
+        try:
+            for key in self._keys:
+                await self._manager._acquire(key)
+                self._held.append(key)
+        except BaseException:
+            await self.__aexit__()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        while self._held:
+            self._manager._release(self._held.pop())
@@ -0,0 +1,29 @@
+# Overview
+# - Sets up logging for the whole bot (called once from main.py)
+# - Handlers only put records on a queue; a background thread formats them and writes them out,
+#   so logging from event handlers never waits on the console or a file
+# - The level comes from LOG_LEVEL (default INFO); per-vote messages are logged at DEBUG
+
+# Libraries to import
+import logging
+import logging.handlers
+import queue
+
+log_format = "%(asctime)s %(levelname)-8s %(name)s: %(message)s"
+
+# Route all logging through a queue and start the thread that writes it out
+# Returns the QueueListener, which should be stopped on shutdown so the last records are written
+def setup_logging(level: str = "INFO"):
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter(log_format))
+    listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(records)]
+    root.setLevel(level.upper())
+    # discord.py is very chatty at DEBUG
+    logging.getLogger("discord").setLevel(max(root.level, logging.INFO))
+
+    listener.start()
+    return listener
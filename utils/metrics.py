@@ -0,0 +1,177 @@
+# Overview
+# - Contains the bot's metrics: latency histograms for event handlers & commands, counters for outbound Discord REST calls,
+#   suggestions store write metrics and event loop lag
+# - Metrics are exposed in Prometheus text format (create_metrics_app) and summarised by the /bot_stats command
+# - Use the module-level `metrics` registry everywhere, e.g. @timed("command:/approve") or metrics.inc("name", label)
+
+# Libraries to import
+import asyncio
+import functools
+import threading
+import time
+from flask import Flask, Response
+
+# Histogram bucket upper bounds (seconds)
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+loop_lag_interval = 0.5  # Seconds between event loop lag samples
+
+# Latency histogram with fixed buckets
+class Histogram:
+    def __init__(self, buckets=latency_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    # Approximate quantile (upper bound of the bucket it falls in)
+    def quantile(self, q: float):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+# Registry of every metric (counters & gauges by name and label, histograms by name and label)
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()   # The HTTP thread reads while the bot writes
+        self.counters = {}              # (name, label) -> value
+        self.gauges = {}                # (name, label) -> value
+        self.histograms = {}            # (name, label) -> Histogram
+        self.help = {}                  # name -> description
+        self.label_names = {}           # name -> what its label means (e.g. "handler", "route")
+
+    def describe(self, name: str, text: str, label_name: str = "handler"):
+        self.help[name] = text
+        self.label_names[name] = label_name
+
+    def inc(self, name: str, label: str = None, amount: float = 1):
+        with self._lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + amount
+
+    def set(self, name: str, value: float, label: str = None):
+        with self._lock:
+            self.gauges[(name, label)] = value
+
+    def observe(self, name: str, value: float, label: str = None):
+        with self._lock:
+            histogram = self.histograms.get((name, label))
+            if histogram is None:
+                histogram = self.histograms[(name, label)] = Histogram()
+            histogram.observe(value)
+
+    # Current values of a counter, {label: value}
+    def counter_values(self, name: str):
+        with self._lock:
+            return {label: value for (metric, label), value in self.counters.items() if metric == name}
+
+    # Current value of a gauge
+    def gauge(self, name: str, label: str = None):
+        with self._lock:
+            return self.gauges.get((name, label), 0.0)
+
+    # Histograms of a metric, {label: Histogram}
+    def histogram_values(self, name: str):
+        with self._lock:
+            return {label: histogram for (metric, label), histogram in self.histograms.items() if metric == name}
+
+    # Render every metric in Prometheus text format
+    def render(self):
+        lines = []
+        with self._lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in values}):
+                    lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (metric, label), value in sorted(values.items(), key=lambda item: str(item[0])):
+                        if metric == name:
+                            lines.append(f"{name}{self._labels(name, label)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# HELP {name} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, label), histogram in sorted(self.histograms.items(), key=lambda item: str(item[0])):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{self._labels(name, label, le=bound)} {cumulative}")
+                    lines.append(f"{name}_sum{self._labels(name, label)} {histogram.total}")
+                    lines.append(f"{name}_count{self._labels(name, label)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    # Build the {label="..."} part of a Prometheus line
+    def _labels(self, name: str, label: str = None, le=None):
+        parts = []
+        if label is not None:
+            parts.append(f'{self.label_names.get(name, "label")}="{label}"')
+        if le is not None:
+            parts.append(f'le="{le}"')
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+# Shared registry
+metrics = Metrics()
+metrics.describe("handler_latency_seconds", "Time spent in event listeners, commands & modals")
+metrics.describe("discord_rest_calls_total", "Outbound Discord REST calls by route", "route")
+metrics.describe("store_flush_seconds", "Time spent writing the suggestions store to disk")
+metrics.describe("store_bytes_written_total", "Bytes written by the suggestions store", "file")
+metrics.describe("event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up")
+metrics.describe("event_loop_lag_seconds_histogram", "Distribution of event loop lag samples")
+metrics.describe("startup_seconds", "Seconds from process start to each start-up milestone", "phase")
+
+# Decorator: record how long an async handler takes in handler_latency_seconds{handler=name}
+# Put it underneath @app_commands.command / @commands.Cog.listener
+def timed(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.observe("handler_latency_seconds", time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+# Count every outbound REST call the bot makes, labelled by method & route (e.g. "GET /channels/{channel_id}/messages/{message_id}")
+def instrument_http(bot):
+    original_request = bot.http.request
+
+    async def counted_request(route, **kwargs):
+        metrics.inc("discord_rest_calls_total", f"{route.method} {route.path}")
+        return await original_request(route, **kwargs)
+
+    bot.http.request = counted_request
+
+# Background task: measure how late the event loop wakes up from a sleep (a busy or blocked loop shows up here)
+async def measure_loop_lag():
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(loop_lag_interval)
+        lag = max(0.0, time.perf_counter() - started - loop_lag_interval)
+        metrics.set("event_loop_lag_seconds", lag)
+        metrics.observe("event_loop_lag_seconds_histogram", lag)
+
+# Flask app that serves /metrics in Prometheus text format (run with utils.stats_api.HTTPServerThread)
+def create_metrics_app():
+    app = Flask(__name__)
+
+    @app.get("/metrics")
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
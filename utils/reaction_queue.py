@@ -0,0 +1,58 @@
+# Overview
+# - Contains ReactionRemovalQueue, which removes users' vote reactions in the background
+# - Requests are keyed by (message, user), so repeated switches by the same user collapse into one removal of their final state
+# - Uses partial message handles, so no message is ever fetched just to remove a reaction
+
+# Libraries to import
+import asyncio
+import logging
+import discord
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait after the first request so a burst of switches can be collapsed
+default_removal_delay = 0.5
+
+# Queue of reaction removals (one per Events cog)
+class ReactionRemovalQueue:
+    def __init__(self, bot, delay: float = default_removal_delay):
+        self.bot = bot
+        self.delay = delay
+        self._pending = {}          # (channel ID, message ID, user ID) -> emoji to remove
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    # Start the background worker
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    # Stop the background worker (pending removals are dropped)
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    # Ask for a user's reaction to be removed (replaces any earlier request for the same user and message)
+    def request(self, channel_id: int, message_id: int, user_id: int, emoji: str):
+        self._pending[(channel_id, message_id, user_id)] = emoji
+        self._wakeup.set()
+
+    # Cancel a waiting request for this emoji (e.g. the user has just voted for it again)
+    def discard(self, channel_id: int, message_id: int, user_id: int, emoji: str):
+        key = (channel_id, message_id, user_id)
+        if self._pending.get(key) == emoji:
+            del self._pending[key]
+
+    # Background task: wait for requests, give a burst time to settle, then apply the final state
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.delay)
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            for (channel_id, message_id, user_id), emoji in pending.items():
+                message = self.bot.get_partial_messageable(channel_id).get_partial_message(message_id)
+                try:
+                    await message.remove_reaction(emoji, discord.Object(id=user_id))
+                except discord.HTTPException as e:
+                    log.warning("Failed to remove %s from %s on message %s: %s", emoji, user_id, message_id, e)
@@ -0,0 +1,218 @@
+# Overview
+# - Contains SearchIndex, an in-memory inverted index over suggestion content & staff responses
+#   (one per guild, created in main.py as partition.search)
+# - Kept up to date from the store's change records (new suggestions & reviews), so /search_suggestions and the
+#   suggestion ID autocomplete never scan the suggestions or read any file
+# - Results are ranked with BM25 (rarer words and shorter suggestions count for more); the last word of a query
+#   can match as a prefix, so autocomplete finds suggestions while the word is still being typed
+# - Archived suggestions stay searchable: the index is built from the working set & the archive (streamed) at start-up
+
+# Libraries to import
+import bisect
+import math
+import re
+from utils.similarity import stop_words
+
+# Ranking settings (standard BM25 values)
+bm25_k1 = 1.2
+bm25_b = 0.75
+max_prefix_terms = 50       # Max index words a prefix is expanded to
+snippet_length = 90         # Characters of each suggestion kept for showing results
+
+# Words of some text, as indexed & searched (lower case, without stop words)
+def tokenize(text: str):
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in stop_words]
+
+# Sorted list of strings that supports adding, removing & prefix lookups
+class PrefixList:
+    def __init__(self, items=()):
+        self._items = sorted(set(items))
+
+    def add(self, item: str):
+        position = bisect.bisect_left(self._items, item)
+        if position == len(self._items) or self._items[position] != item:
+            self._items.insert(position, item)
+
+    def remove(self, item: str):
+        position = bisect.bisect_left(self._items, item)
+        if position < len(self._items) and self._items[position] == item:
+            del self._items[position]
+
+    # Items starting with prefix, in sorted order
+    def with_prefix(self, prefix: str, limit: int = None):
+        start = bisect.bisect_left(self._items, prefix)
+        end = bisect.bisect_left(self._items, prefix + "\uffff")
+        if limit is not None:
+            end = min(end, start + limit)
+        return self._items[start:end]
+
+    def __len__(self):
+        return len(self._items)
+
+# Sorted suggestion IDs, searchable by the digits they start with
+class IDList:
+    def __init__(self, ids=()):
+        self._ids = sorted(set(ids))
+
+    def add(self, suggestion_id: int):
+        position = bisect.bisect_left(self._ids, suggestion_id)
+        if position == len(self._ids) or self._ids[position] != suggestion_id:
+            self._ids.insert(position, suggestion_id)
+
+    def remove(self, suggestion_id: int):
+        position = bisect.bisect_left(self._ids, suggestion_id)
+        if position < len(self._ids) and self._ids[position] == suggestion_id:
+            del self._ids[position]
+
+    # IDs starting with some digits, highest first
+    # The IDs starting with "12" are the ranges 12, 120-129, 1200-1299, ..., so each is a binary search
+    def with_prefix(self, digits: str, limit: int):
+        if not self._ids:
+            return []
+        if not digits:
+            return self._ids[:-limit - 1:-1]
+        start = int(digits)
+        if not start or digits.startswith("0"):
+            return []
+        matches = []
+        scale = 10 ** (len(str(self._ids[-1])) - len(digits))
+        while scale >= 1 and len(matches) < limit:
+            low = bisect.bisect_left(self._ids, start * scale)
+            high = bisect.bisect_left(self._ids, (start + 1) * scale)
+            matches.extend(self._ids[max(low, high - (limit - len(matches))):high][::-1])
+            scale //= 10
+        return matches
+
+    def __contains__(self, suggestion_id: int):
+        position = bisect.bisect_left(self._ids, suggestion_id)
+        return position < len(self._ids) and self._ids[position] == suggestion_id
+
+    def __len__(self):
+        return len(self._ids)
+
+# Inverted index over one guild's suggestions
+class SearchIndex:
+    def __init__(self, store):
+        self.store = store
+        self._postings = {}             # Word -> {suggestion ID: times it appears}
+        self._words = PrefixList()      # Every indexed word, for prefix matching
+        self._docs = {}                 # Suggestion ID -> [status, number of words, snippet]
+        self._total_length = 0          # Words in all suggestions (for the average length)
+        self._pending_ids = IDList()     # For ID autocomplete
+        self._all_ids = IDList()
+        store.add_listener(self._on_change)
+
+    # Index every suggestion from scratch (the live ones & those read from the archive, see GuildPartition.start):
+    # reset(), load() for each suggestion (one at a time, so they can be streamed), then finish_load()
+    def reset(self):
+        self._postings = {}
+        self._docs = {}
+        self._total_length = 0
+
+    def load(self, suggestion: dict):
+        self._add(suggestion)
+
+    # Build the sorted word & ID lists once every suggestion is indexed
+    def finish_load(self):
+        self._words = PrefixList(self._postings)
+        self._pending_ids = IDList(suggestion_id for suggestion_id, doc in self._docs.items() if doc[0] == "pending")
+        self._all_ids = IDList(self._docs)
+
+    # Store listener: index new suggestions, and staff responses & status changes when they are reviewed
+    def _on_change(self, record: dict):
+        op = record["op"]
+        if op == "create":
+            suggestion = record["suggestion"]
+            self._add(suggestion, update_lists=True)
+        elif op == "status":
+            doc = self._docs.get(record["id"])
+            if doc is None:
+                return
+            doc[0] = record["status"]
+            if record["status"] == "pending":
+                self._pending_ids.add(record["id"])
+            else:
+                self._pending_ids.remove(record["id"])
+            if record["staff_response"] and record["previous"] == "pending":     # Staff responses are given when reviewing
+                self._index_words(record["id"], tokenize(record["staff_response"]), update_lists=True)
+
+    def _add(self, suggestion: dict, update_lists: bool = False):
+        suggestion_id = suggestion["id"]
+        if suggestion_id in self._docs:
+            return
+        content = suggestion["content"]
+        snippet = content if len(content) <= snippet_length else content[:snippet_length - 1] + "…"
+        self._docs[suggestion_id] = [suggestion["status"], 0, snippet]
+        words = tokenize(content)
+        if suggestion.get("staff_response"):
+            words += tokenize(suggestion["staff_response"])
+        self._index_words(suggestion_id, words, update_lists)
+        if update_lists:
+            self._all_ids.add(suggestion_id)
+            if suggestion["status"] == "pending":
+                self._pending_ids.add(suggestion_id)
+
+    def _index_words(self, suggestion_id: int, words, update_lists: bool):
+        for word in words:
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                if update_lists:
+                    self._words.add(word)
+            postings[suggestion_id] = postings.get(suggestion_id, 0) + 1
+        self._docs[suggestion_id][1] += len(words)
+        self._total_length += len(words)
+
+    # --- Reads ---
+
+    # Rank suggestions for a query, returning [(suggestion ID, score)], best first
+    # With prefix=True the last word also matches longer words starting with it (for search-as-you-type)
+    def search(self, query: str, status: str = None, limit: int = 10, prefix: bool = False):
+        words = tokenize(query)
+        if not words or not self._docs:
+            return []
+        # Words to score, with a weight (words only matched by the typed prefix count a little less)
+        terms = {word: 1.0 for word in words[:-1]}
+        last = words[-1]
+        if prefix and not query[-1].isspace():
+            for word in self._words.with_prefix(last, max_prefix_terms):
+                terms[word] = max(terms.get(word, 0.0), 1.0 if word == last else 0.8)
+        else:
+            terms[last] = 1.0
+
+        doc_count = len(self._docs)
+        average_length = self._total_length / doc_count or 1.0
+        scores = {}
+        for word, weight in terms.items():
+            postings = self._postings.get(word)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for suggestion_id, frequency in postings.items():
+                doc = self._docs[suggestion_id]
+                if status is not None and doc[0] != status:
+                    continue
+                norm = bm25_k1 * (1 - bm25_b + bm25_b * doc[1] / average_length)
+                scores[suggestion_id] = scores.get(suggestion_id, 0.0) + weight * idf * frequency * (bm25_k1 + 1) / (frequency + norm)
+        # Highest score first, newest suggestion first on ties
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+
+    # Suggestion IDs starting with some digits: the exact ID first, then newest first
+    # (pending ones only, unless pending_only=False)
+    def ids_with_prefix(self, digits: str, pending_only: bool = True, limit: int = 25):
+        ids = self._pending_ids if pending_only else self._all_ids
+        matches = ids.with_prefix(digits, limit)
+        if digits.isdigit() and int(digits) in ids:
+            matches = [int(digits)] + [suggestion_id for suggestion_id in matches if suggestion_id != int(digits)][:limit - 1]
+        return matches
+
+    def status_of(self, suggestion_id: int):
+        doc = self._docs.get(suggestion_id)
+        return doc[0] if doc else None
+
+    def snippet(self, suggestion_id: int):
+        doc = self._docs.get(suggestion_id)
+        return doc[2] if doc else None
+
+    def __len__(self):
+        return len(self._docs)
@@ -0,0 +1,116 @@
+# Overview
+# - Contains SimilarityIndex, used to spot likely duplicate suggestions when a new one is submitted (one per guild, created in main.py as partition.similarity)
+# - Each suggestion is turned into a hashed bag of words & word pairs, stored as one normalised column of a NumPy matrix
+#   (one contiguous float32 row per feature)
+# - A new suggestion is compared against every existing one with a single vector-matrix product over just the features
+#   it uses (a few dozen of the 256 rows), so a query reads a small part of the matrix however many suggestions there are
+# - The matrix is saved to data/similarity.npz every few minutes (GuildPartition calls save_if_changed) and on shutdown,
+#   so start-up only embeds suggestions added since
+
+# Libraries to import
+import os
+import re
+import threading
+import zlib
+import numpy as np
+
+# File where the similarity index is stored
+similarity_file = "data/similarity.npz"
+
+# Index settings
+vector_size = 256               # Number of hashed features per suggestion
+duplicate_threshold = 0.5       # Cosine similarity at which a suggestion counts as a likely duplicate
+max_duplicates = 3              # Max likely duplicates reported for one suggestion
+
+# Common words that say nothing about what a suggestion is about
+stop_words = {
+    "a", "an", "the", "and", "or", "to", "of", "for", "in", "on", "at", "by", "with", "is", "are", "be", "it",
+    "that", "this", "they", "we", "i", "you", "should", "could", "would", "can", "get", "some", "so", "etc"
+}
+
+# Turn suggestion text into a normalised feature vector (hashed words & word pairs, ignoring stop words)
+def embed_text(text: str):
+    vector = np.zeros(vector_size, dtype=np.float32)
+    words = [word for word in re.findall(r"\w+", text.lower()) if word not in stop_words]
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for feature in features:
+        # crc32 rather than hash(), so vectors stay the same between runs
+        vector[zlib.crc32(feature.encode()) % vector_size] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+# Similarity index over all suggestion content
+class SimilarityIndex:
+    def __init__(self, path: str = similarity_file):
+        self.path = path
+        self._matrix = np.zeros((vector_size, 64), dtype=np.float32)   # One row per feature, one column per suggestion (spare columns at the end)
+        self._ids = np.zeros(64, dtype=np.int64)                        # Suggestion ID for each column
+        self._count = 0                                                 # Columns in use
+        self._known = set()                                             # Suggestion IDs already in the index
+        self._saved_count = 0                                           # Columns already in the saved file
+        self._save_lock = threading.Lock()                              # Periodic & shutdown saves may overlap (worker threads)
+
+    # Load the saved index (if any)
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as saved:
+            if saved["matrix"].shape[1] != vector_size:
+                return  # Saved with different settings, rebuild from scratch
+            # Saved with one row per suggestion
+            self._matrix = np.ascontiguousarray(saved["matrix"].T, dtype=np.float32)
+            self._ids = saved["ids"].copy()
+        self._count = len(self._ids)
+        self._known = set(self._ids.tolist())
+        self._saved_count = self._count
+
+    # Save the index (written to a temporary file first and swapped in)
+    def save(self):
+        with self._save_lock:
+            count = self._count
+            temp_path = self.path + ".tmp.npz"
+            np.savez(temp_path, matrix=self._matrix[:, :count].T, ids=self._ids[:count])
+            os.replace(temp_path, self.path)
+            self._saved_count = count
+
+    # Save the index if suggestions were added since it was last saved; returns whether it was saved
+    def save_if_changed(self):
+        if self._count == self._saved_count:
+            return False
+        self.save()
+        return True
+
+    # Add one suggestion to the index (skipped if it is already there, e.g. loaded from the saved file)
+    def add(self, suggestion_id: int, text: str):
+        if suggestion_id in self._known:
+            return
+        # Grow the matrix by doubling when it is full (a new array, so a save in progress keeps its own)
+        if self._count == len(self._ids):
+            spare = max(len(self._ids), 64)     # A saved index may be empty
+            self._matrix = np.concatenate([self._matrix, np.zeros((vector_size, spare), dtype=np.float32)], axis=1)
+            self._ids = np.concatenate([self._ids, np.zeros(spare, dtype=np.int64)])
+        self._matrix[:, self._count] = embed_text(text)
+        self._ids[self._count] = suggestion_id
+        self._count += 1
+        self._known.add(suggestion_id)
+
+    # Find likely duplicates of some text
+    # Returns [(suggestion ID, similarity)], most similar first
+    def query(self, text: str, threshold: float = duplicate_threshold, limit: int = max_duplicates):
+        if not self._count:
+            return []
+        vector = embed_text(text)
+        features = np.flatnonzero(vector)
+        if not len(features):
+            return []
+        scores = vector[features] @ self._matrix[features, :self._count]
+        candidates = np.flatnonzero(scores >= threshold)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(scores[candidates], -limit)[-limit:]]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(int(self._ids[row]), float(scores[row])) for row in candidates]
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,202 @@
+# Overview
+# - Contains SQLiteSuggestionStore, an optional SQLite backend for the suggestions store (STORAGE_MODE=sqlite in main.py)
+# - Cogs use it exactly like SuggestionStore: reads come from memory and changes are written in the background
+# - All writes go through one aiosqlite connection that is opened once at start-up (WAL mode)
+# - Run this file directly to import an existing suggestions.json into the database:
+#   python -m utils.sqlite_store [data/suggestions.json] [data/suggestions.db]
+
+# Libraries to import
+import asyncio
+import os
+import pathlib
+import sys
+import aiosqlite
+from utils.suggestion_management import SuggestionStore, load_data, data_file, default_flush_interval, default_flush_threshold
+from utils.votes import VoteSet, CHOICES
+
+# Database file for the SQLite backend
+sqlite_file = "data/suggestions.db"
+
+# Tables and indexes
+schema = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER
+);
+CREATE TABLE IF NOT EXISTS suggestions (
+    id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    status TEXT NOT NULL,
+    staff_response TEXT,
+    language TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_suggestions_message_id ON suggestions (message_id);
+CREATE INDEX IF NOT EXISTS idx_suggestions_status ON suggestions (status);
+CREATE TABLE IF NOT EXISTS votes (
+    suggestion_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    choice TEXT NOT NULL,
+    PRIMARY KEY (suggestion_id, user_id)
+) WITHOUT ROWID;
+-- Nothing reads votes by side (they are loaded into memory at start-up), so the old index only slowed down writes
+DROP INDEX IF EXISTS idx_votes_choice;
+"""
+
+# Open the database in WAL mode and make sure the tables exist
+async def connect(path: str = sqlite_file):
+    db = await aiosqlite.connect(path)
+    await db.execute("PRAGMA journal_mode=WAL")
+    await db.execute("PRAGMA synchronous=NORMAL")
+    await db.executescript(schema)
+    # Databases created before language detection need the new column
+    columns = [row[1] for row in await db.execute_fetchall("PRAGMA table_info(suggestions)")]
+    if "language" not in columns:
+        await db.execute("ALTER TABLE suggestions ADD COLUMN language TEXT")
+    await db.commit()
+    return db
+
+# Open an existing database without writing to it (no WAL switch, schema or migration), e.g. for export.py
+async def connect_read_only(path: str = sqlite_file):
+    return await aiosqlite.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+# Write a single store change to the database (called inside a transaction)
+async def apply_record(db, record: dict):
+    op = record["op"]
+    if op == "vote_add":
+        # Single-row upsert: a switch from tick to cross just updates the choice
+        await db.execute(
+            "INSERT INTO votes (suggestion_id, user_id, choice) VALUES (?, ?, ?) "
+            "ON CONFLICT (suggestion_id, user_id) DO UPDATE SET choice = excluded.choice",
+            (record["id"], record["user_id"], record["choice"])
+        )
+    elif op == "vote_remove":
+        await db.execute(
+            "DELETE FROM votes WHERE suggestion_id = ? AND user_id = ? AND choice = ?",
+            (record["id"], record["user_id"], record["choice"])
+        )
+    elif op == "create":
+        await insert_suggestion(db, record["suggestion"])
+    elif op == "status":
+        await db.execute(
+            "UPDATE suggestions SET status = ?, staff_response = ? WHERE id = ?",
+            (record["status"], record["staff_response"], record["id"])
+        )
+    elif op == "language":
+        await db.execute("UPDATE suggestions SET language = ? WHERE id = ?", (record["language"], record["id"]))
+    elif op == "panel":
+        await set_meta(db, "panel_id", record["panel_id"])
+    elif op == "last_id":
+        await set_meta(db, "last_id", record["last_id"])
+    elif op == "archive":
+        # Moved to the archive: only pending suggestions stay in the database
+        await db.executemany("DELETE FROM votes WHERE suggestion_id = ?", [(suggestion_id,) for suggestion_id in record["ids"]])
+        await db.executemany("DELETE FROM suggestions WHERE id = ?", [(suggestion_id,) for suggestion_id in record["ids"]])
+
+# Insert (or replace) a suggestion and all of its votes
+async def insert_suggestion(db, suggestion: dict):
+    await db.execute(
+        "INSERT OR REPLACE INTO suggestions (id, message_id, author_id, content, status, staff_response, language) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (suggestion["id"], suggestion["message_id"], suggestion["author_id"], suggestion["content"], suggestion["status"], suggestion["staff_response"], suggestion.get("language"))
+    )
+    votes = VoteSet.from_json(suggestion["votes"])
+    await db.executemany(
+        "INSERT OR REPLACE INTO votes (suggestion_id, user_id, choice) VALUES (?, ?, ?)",
+        [(suggestion["id"], user_id, choice) for choice in CHOICES for user_id in votes.voters(choice)]
+    )
+
+# Set a value in the meta table (last_id, panel_id)
+async def set_meta(db, key: str, value):
+    await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+# Suggestions store backed by SQLite instead of suggestions.json
+class SQLiteSuggestionStore(SuggestionStore):
+    def __init__(self, db_path: str = sqlite_file, flush_interval: float = default_flush_interval, flush_threshold: int = default_flush_threshold, archive=None):
+        super().__init__(flush_interval=flush_interval, flush_threshold=flush_threshold, archive=archive)
+        self.db_path = db_path
+        self.db = None              # The single long-lived connection
+
+    # Open the connection and load every suggestion and vote into memory
+    # read_only=True opens the database read-only (a missing database reads as empty instead of being created)
+    async def _load(self, read_only: bool = False):
+        if read_only:
+            if not os.path.exists(self.db_path):
+                self.data = {"last_id": 0, "panel_id": None, "suggestions": []}
+                self._build_indexes()
+                return
+            self.db = await connect_read_only(self.db_path)
+        else:
+            self.db = await connect(self.db_path)
+        meta = dict(await self.db.execute_fetchall("SELECT key, value FROM meta"))
+        votes = {}
+        for suggestion_id, user_id, choice in await self.db.execute_fetchall("SELECT suggestion_id, user_id, choice FROM votes"):
+            votes.setdefault(suggestion_id, {choice: [] for choice in CHOICES})[choice].append(user_id)
+        suggestions = []
+        # A read-only open can't add the language column to databases created before language detection
+        columns = [row[1] for row in await self.db.execute_fetchall("PRAGMA table_info(suggestions)")]
+        rows = await self.db.execute_fetchall(
+            f"SELECT id, message_id, author_id, content, status, staff_response, {'language' if 'language' in columns else 'NULL'} FROM suggestions ORDER BY id"
+        )
+        for suggestion_id, message_id, author_id, content, status, staff_response, language in rows:
+            suggestion_votes = votes.get(suggestion_id, {})
+            suggestions.append({
+                "id": suggestion_id,
+                "message_id": message_id,
+                "author_id": author_id,
+                "content": content,
+                "votes": VoteSet(*(suggestion_votes.get(choice, ()) for choice in CHOICES)),
+                "status": status,
+                "staff_response": staff_response,
+                "language": language
+            })
+        self.data = {"last_id": meta.get("last_id", 0), "panel_id": meta.get("panel_id"), "suggestions": suggestions}
+        self._build_indexes()
+
+    # Close the connection without writing anything
+    async def close_read_only(self):
+        if self.db:
+            await self.db.close()
+            self.db = None
+
+    # Flush remaining changes, then close the connection
+    async def close(self):
+        await super().close()
+        if self.db:
+            await self.db.close()
+            self.db = None
+
+    # Every change is kept as a record and written as a row update on the next flush
+    def _record(self, record: dict):
+        self._journal_buffer.append(record)
+
+    # Apply waiting changes in a single transaction
+    async def _persist(self):
+        await self._archive_closed()
+        records, self._journal_buffer = self._journal_buffer, []
+        try:
+            for record in records:
+                await apply_record(self.db, record)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            self._journal_buffer[:0] = records
+            raise
+
+# One-shot migration: import suggestions.json (suggestions, votes, last_id and panel_id) into the database
+async def migrate_json(json_path: str = data_file, db_path: str = sqlite_file):
+    data = load_data(json_path)
+    db = await connect(db_path)
+    try:
+        for suggestion in data["suggestions"]:
+            await insert_suggestion(db, suggestion)
+        await set_meta(db, "last_id", data["last_id"])
+        await set_meta(db, "panel_id", data.get("panel_id"))
+        await db.commit()
+    finally:
+        await db.close()
+    print(f"Imported {len(data['suggestions'])} suggestions from {json_path} into {db_path}")
+
+# This code runs only if the file is executed directly (python -m utils.sqlite_store)
+if __name__ == "__main__":
+    asyncio.run(migrate_json(*sys.argv[1:3]))
@@ -0,0 +1,205 @@
+# Overview
+# - Contains a small read-only HTTP API (Flask) for staff dashboards, run in its own thread next to the bot
+# - Requests are served from an immutable snapshot of the suggestions, never from suggestions.json
+# - The bot publishes a new snapshot (swapped in atomically) shortly after each change to the store
+# - Every response has an ETag (unique to this process & snapshot), so dashboards polling with If-None-Match get a cheap
+#   304 when nothing has changed
+# - Each suggestion is serialised once and again only when it changes (archived suggestions never do), and the
+#   snapshot is joined from those bodies in a worker thread, so publishing never blocks the event loop for long
+# - Each guild has its own publisher; requests pick one with ?guild=<guild ID> (optional when the bot serves one guild)
+# Endpoints:
+#   GET /api/suggestions?status=pending   - all suggestions (optionally filtered by status) with vote counts
+#   GET /api/suggestions/<id>             - one suggestion with vote counts
+#   GET /api/stats                        - totals per status, total votes & approval rate
+
+# Libraries to import
+import asyncio
+import json
+import logging
+import os
+import threading
+from flask import Flask, Response, request
+from werkzeug.serving import make_server
+from utils.votes import TICK, CROSS
+
+log = logging.getLogger(__name__)
+
+# Default settings (main.py can override these from the environment)
+default_stats_api_host = "127.0.0.1"
+default_publish_delay = 1.0     # Seconds to wait after a change before publishing, so bursts of votes make one snapshot
+
+# Random per-process prefix of every ETag, so a version number seen before a restart never matches a new snapshot
+boot_id = os.urandom(4).hex()
+
+# API representation of one suggestion
+def stats_row(suggestion: dict):
+    return {
+        "id": suggestion["id"],
+        "author_id": str(suggestion["author_id"]),
+        "content": suggestion["content"],
+        "status": suggestion["status"],
+        "staff_response": suggestion["staff_response"],
+        "language": suggestion.get("language"),
+        "votes": {TICK: suggestion["votes"].count(TICK), CROSS: suggestion["votes"].count(CROSS)}
+    }
+
+# One suggestion as the snapshot needs it: (ID, status, JSON body, ticks, crosses)
+# The body is serialised once here and reused by every snapshot until the suggestion changes
+def stats_entry(suggestion: dict):
+    row = stats_row(suggestion)
+    return (row["id"], row["status"], json.dumps(row), row["votes"][TICK], row["votes"][CROSS])
+
+# Read-only view of the store at one point in time (response bodies are joined from the entries' bodies when it is built,
+# in a worker thread)
+class StatsSnapshot:
+    def __init__(self, version: int, entries):
+        self.version = version
+        self.etag = f'"{boot_id}-{version}"'
+        entries = sorted(entries)
+        self.suggestion_bodies = {entry[0]: entry[2] for entry in entries}
+        by_status = {}      # Status -> bodies of its suggestions
+        for suggestion_id, status, body, ticks, crosses in entries:
+            by_status.setdefault(status, []).append(body)
+        self.status_bodies = {status: "[" + ", ".join(bodies) + "]" for status, bodies in by_status.items()}     # Status (None for all) -> body of /api/suggestions
+        self.status_bodies[None] = "[" + ", ".join(entry[2] for entry in entries) + "]"
+
+        # Aggregate stats
+        totals = {status: len(bodies) for status, bodies in by_status.items()}
+        reviewed = totals.get("approved", 0) + totals.get("rejected", 0)
+        self.stats_body = json.dumps({
+            "suggestions": len(entries),
+            "by_status": totals,
+            "votes": {TICK: sum(entry[3] for entry in entries), CROSS: sum(entry[4] for entry in entries)},
+            "approval_rate": totals.get("approved", 0) / reviewed if reviewed else None
+        })
+
+# Keeps the latest snapshot of the store up to date (one per guild, created in main.py as partition.stats_api)
+# Only the suggestions that changed since the last snapshot are serialised again on the event loop; joining the bodies
+# into a new snapshot runs in a worker thread
+class StatsPublisher:
+    def __init__(self, store, delay: float = default_publish_delay):
+        self.store = store
+        self.delay = delay
+        self.snapshot = None        # Replaced as a whole, so the HTTP thread always sees a complete snapshot
+        self._version = 0
+        self._task = None
+        self._live_entries = {}     # Suggestion ID -> entry, for suggestions in the working set
+        self._archived_entries = {} # Suggestion ID -> entry, for suggestions in the archive (they never change)
+        self._dirty = set()         # Working-set suggestions changed since the last snapshot
+        self._published = False     # The first snapshot reads the whole working set
+        store.add_listener(self._on_change)
+
+    # Add a suggestion already in the archive (read once at start-up, see GuildPartition.start)
+    def add_archived(self, suggestion: dict):
+        self._archived_entries[suggestion["id"]] = stats_entry(suggestion)
+
+    # Build and swap in a new snapshot
+    async def publish(self):
+        self._version += 1
+        version = self._version
+        if not self._published:
+            self._dirty.update(suggestion["id"] for suggestion in self.store.data["suggestions"])
+            self._published = True
+        for suggestion_id in self._dirty:
+            suggestion = self.store.get(suggestion_id)
+            if suggestion is None:
+                self._live_entries.pop(suggestion_id, None)     # Archived
+            else:
+                self._live_entries[suggestion_id] = stats_entry(suggestion)
+        self._dirty = set()
+        # The entries are immutable tuples, so the thread only needs a copy of the list
+        entries = list(self._live_entries.values())
+        entries.extend(entry for suggestion_id, entry in self._archived_entries.items() if suggestion_id not in self._live_entries)
+        snapshot = await asyncio.to_thread(StatsSnapshot, version, entries)
+        if self.snapshot is None or version > self.snapshot.version:    # A newer snapshot wasn't swapped in meanwhile
+            self.snapshot = snapshot
+
+    # Store listener: publish a new snapshot shortly after a change (collapsing bursts into one)
+    def _on_change(self, record: dict):
+        op = record["op"]
+        if op == "archive":
+            # Sent just before the suggestions leave the working set, so they can still be read here
+            for suggestion_id in record["ids"]:
+                self.add_archived(self.store.get(suggestion_id))
+            self._dirty.update(record["ids"])
+        elif op == "create":
+            self._dirty.add(record["suggestion"]["id"])
+        elif "id" in record:
+            self._dirty.add(record["id"])
+        else:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._publish_later())
+
+    # Publish after the delay, and again if more changes came in while the snapshot was being built
+    async def _publish_later(self):
+        while True:
+            await asyncio.sleep(self.delay)
+            try:
+                await self.publish()
+            except Exception:
+                log.exception("Error publishing the stats snapshot")
+            if not self._dirty:
+                return
+
+# Build the Flask app that serves the publishers' current snapshots ({guild ID: publisher})
+def create_app(publishers: dict):
+    app = Flask(__name__)
+
+    # Snapshot of the guild asked for, or the error to send instead (unknown guild, or still loading after a restart)
+    def current_snapshot():
+        guild = request.args.get("guild")
+        if guild is None:
+            publisher = next(iter(publishers.values())) if len(publishers) == 1 else None
+        else:
+            publisher = publishers.get(int(guild)) if guild.isdigit() else None
+        if publisher is None:
+            return None, respond(None, "")
+        if publisher.snapshot is None:
+            return None, Response(json.dumps({"error": "starting up"}), status=503, mimetype="application/json", headers={"Retry-After": "5"})
+        return publisher.snapshot, None
+
+    # Send a JSON body, or 304 if the client already has this version
+    def respond(body, etag: str):
+        if body is None:
+            return Response(json.dumps({"error": "not found"}), status=404, mimetype="application/json")
+        if request.if_none_match.contains(etag.strip('"')):
+            return Response(status=304, headers={"ETag": etag})
+        return Response(body, mimetype="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    @app.get("/api/suggestions")
+    def suggestions():
+        snapshot, error = current_snapshot()
+        if error is not None:
+            return error
+        status = request.args.get("status")
+        return respond(snapshot.status_bodies.get(status, "[]"), snapshot.etag)
+
+    @app.get("/api/suggestions/<int:suggestion_id>")
+    def suggestion(suggestion_id):
+        snapshot, error = current_snapshot()
+        if error is not None:
+            return error
+        return respond(snapshot.suggestion_bodies.get(suggestion_id), snapshot.etag)
+
+    @app.get("/api/stats")
+    def stats():
+        snapshot, error = current_snapshot()
+        if error is not None:
+            return error
+        return respond(snapshot.stats_body, snapshot.etag)
+
+    return app
+
+# Runs a Flask app in a background thread
+class HTTPServerThread:
+    def __init__(self, app, host: str, port: int):
+        self._server = make_server(host, port, app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"http-{port}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        log.info("HTTP server listening on http://%s:%s", self._server.host, self._server.port)
+
+    def stop(self):
+        self._server.shutdown()
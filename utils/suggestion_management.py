@@ -1,47 +1,452 @@
 # Overview
 # - Contains various Python functions to manage suggestions data stored in JSON (suggestions.json)
+# - Contains the SuggestionStore, a process-wide in-memory copy of that data which the bot owns and shares with every cog
+# - The store writes changes back to disk in the background (write-behind), so events never wait on file I/O
+# - In journal mode, each change is appended as a small record to suggestions.journal instead of rewriting suggestions.json,
+#   and the journal is folded back into suggestions.json (compacted) once it grows past a size threshold
+# - With an archive (utils/archive.py), approved & rejected suggestions are moved out of the working set on the next flush,
+#   so suggestions.json only holds pending suggestions; archived ones are read back on demand with get_archived()
 
 # Libraries to import
+import asyncio
 import json
+import logging
 import os
+import time
+from utils.votes import VoteSet, encode_votes
+from utils.metrics import metrics
+
+log = logging.getLogger(__name__)
 
 # File where suggestions and panel info is stored
 data_file = "data/suggestions.json"
+# Append-only log of changes made since suggestions.json was last written (journal mode only)
+journal_file = "data/suggestions.journal"
+
+# Default write-behind settings (main.py can override these from the environment)
+default_flush_interval = 5.0    # Seconds between background flushes
+default_flush_threshold = 50    # Number of unsaved changes that triggers an early flush
+default_compact_threshold = 1024 * 1024     # Journal size (bytes) that triggers compaction into suggestions.json
+
+# Statuses of suggestions that are closed for voting (moved to the archive, if there is one)
+closed_statuses = ("approved", "rejected")
 
 # Load suggestions.json into a Python dictionary
-# If the file does not exist, create a new one with base structure
-def load_data():
-    if not os.path.exists(data_file):
+# If the file does not exist, create a new one with base structure (or just return it, with create=False)
+def load_data(path: str = data_file, create: bool = True):
+    if not os.path.exists(path):
         # Base structure for new file
         base_structure = {
             "last_id": 0,       # Tracks the last used suggestion ID
             "panel_id": None,   # Stores the current suggestion panel message ID
             "suggestions": []   # List to store all suggestions
             }
-        save_data(base_structure)
+        if not create:
+            return base_structure
+        save_data(base_structure, path)
         # Read the JSON file and return as a Python dictionary
-    with open(data_file, "r") as f:
+    with open(path, "r") as f:
         return json.load(f)
 
 # Save a Python dictionary back into suggestions.json
-def save_data(data: dict):
-    with open(data_file, "w") as f:
-        json.dump(data, f, indent=4)
-
-# Increment last_id and return a new unique suggestion ID
-def get_next_id():
-    data = load_data()
-    data["last_id"] += 1
-    save_data(data)
-    return data["last_id"]
-
-# Get the current suggestion panel message ID (if any)
-def get_panel_id():
-    data = load_data()
-    return data.get("panel_id")
-
-# Update the suggestion panel message ID
-def set_panel_id(message_id: int):
-    data = load_data()
-    data["panel_id"] = message_id
-    save_data(data)
\ No newline at end of file
+def save_data(data: dict, path: str = data_file):
+    write_file(path, json.dumps(data, indent=4))
+
+# Write already-serialised text to a file (used by the store from a worker thread)
+# Writes to a temporary file first and swaps it in, so a crash mid-write never leaves a truncated file
+def write_file(path: str, text: str):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        metrics.inc("store_bytes_written_total", os.path.basename(path), f.tell())
+    os.replace(temp_path, path)
+
+# Append already-serialised records to the journal and return its new size in bytes
+def append_file(path: str, text: str):
+    with open(path, "a") as f:
+        start = f.tell()
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+        metrics.inc("store_bytes_written_total", os.path.basename(path), f.tell() - start)
+        return f.tell()
+
+# Read all records from the journal (a half-written last line from a crash is skipped)
+def load_journal(path: str = journal_file):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                log.warning("Skipping unreadable journal record in %s", path)
+    return records
+
+# Write a new snapshot (suggestions.json) and empty the journal it replaces
+def write_snapshot(path: str, journal_path: str, text: str):
+    write_file(path, text)
+    open(journal_path, "w").close()
+
+# In-memory suggestions store shared by all cogs (one per guild, created in main.py as partition.store)
+class SuggestionStore:
+    def __init__(self, path: str = data_file, flush_interval: float = default_flush_interval, flush_threshold: int = default_flush_threshold,
+                 journal: bool = False, journal_path: str = journal_file, compact_threshold: int = default_compact_threshold, archive=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.journal = journal                      # Append changes to the journal instead of rewriting the whole file
+        self.journal_path = journal_path
+        self.compact_threshold = compact_threshold
+        self.archive = archive                      # Cold tier for closed suggestions (None keeps them in the working set)
+        self.before_archive = None                  # async before_archive(suggestions), awaited before closed suggestions are archived
+        self.data = None            # Loaded by start()
+        self._by_id = {}            # Suggestion ID -> suggestion
+        self._by_message = {}       # Discord message ID -> suggestion
+        self._by_status = {}        # Status -> {suggestion ID: suggestion}
+        self._dirty = 0             # Number of changes not yet written to disk
+        self._journal_buffer = []   # Journal records not yet written to disk
+        self._journal_size = 0      # Current size of the journal in bytes
+        self._listeners = []        # Functions called with every change record
+        self._wakeup = None         # Set to flush before the interval is up
+        self._flush_lock = None     # Only one flush may write the file at a time
+        self._flush_task = None
+
+    # Load the data into memory and start the background flusher
+    async def start(self):
+        await self._load()
+        if self.archive is not None:
+            await asyncio.to_thread(self.archive.load)
+            # A crash between an archive append and the next working-data write leaves archived suggestions behind in
+            # the working set; the archive holds their final state, so they are dropped (and the drop saved on the first flush)
+            stale = self._archived_in_working_set()
+            if stale:
+                self._record({"op": "archive", "ids": stale})
+                self._drop(stale)
+                self.mark_dirty()
+                log.warning("SuggestionStore dropped %d suggestions that were already archived", len(stale))
+            # Closed suggestions still in the working set (e.g. from before archiving) are moved on the first flush
+            if any(self._by_status.get(status) for status in closed_statuses):
+                self.mark_dirty()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    # Load the data for reading only: no background flusher, no file created, and nothing is ever written back
+    # (for tools such as export.py, which may run while the bot is using the same files)
+    async def open_read_only(self):
+        await self._load(read_only=True)
+        if self.archive is not None:
+            await asyncio.to_thread(self.archive.load, False)
+            self._drop(self._archived_in_working_set())
+
+    # Release anything open_read_only() holds (other storage backends override this)
+    async def close_read_only(self):
+        pass
+
+    # Load the JSON file into memory (other storage backends override this)
+    # In journal mode, changes logged since the last snapshot are replayed on top of it
+    # read_only=True never writes (a missing file reads as empty instead of being created)
+    async def _load(self, read_only: bool = False):
+        self.data = await asyncio.to_thread(load_data, self.path, not read_only)
+        self._build_indexes()
+        if self.journal:
+            records = await asyncio.to_thread(load_journal, self.journal_path)
+            for record in records:
+                self._replay(record)
+            self._journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+            log.info("SuggestionStore replayed %d journal records", len(records))
+
+    # Stop the background flusher and write any remaining changes (called on shutdown)
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        # Leave a fresh snapshot behind so the next start-up has nothing to replay
+        if self.journal and self._journal_size:
+            async with self._flush_lock:
+                await self._compact()
+
+    # Record a change made to the in-memory data, mark it for saving and tell any listeners
+    def _changed(self, record: dict, dirty: bool = True):
+        self._record(record)
+        if dirty:
+            self.mark_dirty()
+        for listener in self._listeners:
+            try:
+                listener(record)
+            except Exception:
+                log.exception("Error in SuggestionStore listener %r", listener)
+
+    # Keep a change record for the next flush (journal mode only; other storage backends override this)
+    def _record(self, record: dict):
+        if self.journal:
+            self._journal_buffer.append(record)
+
+    # Call a function with every change record (e.g. to keep a read-only snapshot or aggregates up to date)
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    # Record that the in-memory data has changed and needs saving
+    def mark_dirty(self):
+        self._dirty += 1
+        if self._dirty >= self.flush_threshold and self._wakeup:
+            self._wakeup.set()
+
+    # Write the in-memory data to disk if anything has changed since the last flush
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty = self._dirty
+            self._dirty = 0
+            started = time.perf_counter()
+            try:
+                await self._persist()
+            except Exception:
+                self._dirty += dirty  # Try again on the next flush
+                raise
+            finally:
+                metrics.observe("store_flush_seconds", time.perf_counter() - started)
+
+    # Write waiting changes to disk (other storage backends override this)
+    async def _persist(self):
+        await self._archive_closed()
+        if self.journal:
+            await self._append_journal()
+        else:
+            # Serialise on the event loop so the data can't change mid-dump, then write from a worker thread
+            text = json.dumps(self.data, indent=4, default=encode_votes)
+            await asyncio.to_thread(write_file, self.path, text)
+
+    # Append waiting records to the journal, compacting it once it passes compact_threshold
+    async def _append_journal(self):
+        records, self._journal_buffer = self._journal_buffer, []
+        if records:
+            text = "".join(json.dumps(record, default=encode_votes) + "\n" for record in records)
+            try:
+                self._journal_size = await asyncio.to_thread(append_file, self.journal_path, text)
+            except Exception:
+                self._journal_buffer[:0] = records
+                raise
+        if self._journal_size >= self.compact_threshold:
+            await self._compact()
+
+    # Fold the journal into a new suggestions.json snapshot (written atomically) and empty the journal
+    # Records added while this runs are appended to the fresh journal afterwards; replaying them is harmless
+    async def _compact(self):
+        text = json.dumps(self.data, indent=4, default=encode_votes)
+        await asyncio.to_thread(write_snapshot, self.path, self.journal_path, text)
+        self._journal_size = 0
+        log.info("SuggestionStore compacted the journal into a new snapshot")
+
+    # Move closed suggestions out of the working set into the archive (before the working data is written)
+    # Listeners are told before the suggestions are dropped, so they can still read them with get()
+    async def _archive_closed(self):
+        if self.archive is None:
+            return
+        closed = [suggestion for status in closed_statuses for suggestion in self._by_status.get(status, {}).values()]
+        if not closed:
+            return
+        if self.before_archive is not None:
+            # Last chance to change them (e.g. tag their language); archived suggestions are never rewritten
+            try:
+                await self.before_archive(closed)
+            except Exception:
+                log.exception("Error in SuggestionStore before_archive hook %r", self.before_archive)
+            closed = [suggestion for status in closed_statuses for suggestion in self._by_status.get(status, {}).values()]
+            if not closed:
+                return
+        # Serialised on the event loop (like the working data), so only text is handed to the worker thread
+        members = self.archive.encode(closed)
+        await asyncio.to_thread(self.archive.append_encoded, members)
+        ids = [suggestion["id"] for suggestion in closed]
+        self._changed({"op": "archive", "ids": ids}, dirty=False)   # Written as part of the flush in progress
+        self._drop(ids)
+        log.info("SuggestionStore archived %d closed suggestions", len(ids))
+
+    # Apply a journal record to the in-memory data (start-up only)
+    # Every record describes the end state, so replaying one that is already in the snapshot changes nothing
+    def _replay(self, record: dict):
+        op = record["op"]
+        if op == "last_id":
+            self.data["last_id"] = max(self.data["last_id"], record["last_id"])
+        elif op == "create":
+            suggestion = dict(record["suggestion"])
+            if suggestion["id"] not in self._by_id:
+                suggestion["votes"] = VoteSet.from_json(suggestion["votes"])
+                self.data["suggestions"].append(suggestion)
+                self._index(suggestion)
+            self.data["last_id"] = max(self.data["last_id"], suggestion["id"])
+        elif op == "panel":
+            self.data["panel_id"] = record["panel_id"]
+        elif op == "archive":
+            self._drop(record["ids"])
+        else:
+            suggestion = self._by_id.get(record["id"])
+            if suggestion is None:
+                return
+            if op == "vote_add":
+                suggestion["votes"].add(record["user_id"], record["choice"])
+            elif op == "vote_remove":
+                suggestion["votes"].remove(record["user_id"], record["choice"])
+            elif op == "status":
+                self._move_status(suggestion, record["status"])
+                suggestion["staff_response"] = record["staff_response"]
+            elif op == "language":
+                suggestion["language"] = record["language"]
+
+    # Background task: flush every flush_interval seconds, or sooner once flush_threshold changes are waiting
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Error in SuggestionStore flush")
+
+    # --- Indexes ---
+
+    # Build the lookup indexes from the loaded data (done once at start-up)
+    def _build_indexes(self):
+        self._by_id = {}
+        self._by_message = {}
+        self._by_status = {}
+        for suggestion in self.data["suggestions"]:
+            # Convert stored votes (compact or old list format) into VoteSets
+            suggestion["votes"] = VoteSet.from_json(suggestion["votes"])
+            self._index(suggestion)
+
+    # Add a single suggestion to the lookup indexes
+    def _index(self, suggestion: dict):
+        self._by_id[suggestion["id"]] = suggestion
+        self._by_message[suggestion["message_id"]] = suggestion
+        self._by_status.setdefault(suggestion["status"], {})[suggestion["id"]] = suggestion
+
+    # Remove suggestions from the working set and the lookup indexes
+    def _drop(self, suggestion_ids):
+        dropped = set()
+        for suggestion_id in suggestion_ids:
+            suggestion = self._by_id.pop(suggestion_id, None)
+            if suggestion is None:
+                continue
+            self._by_message.pop(suggestion["message_id"], None)
+            self._by_status.get(suggestion["status"], {}).pop(suggestion_id, None)
+            dropped.add(suggestion_id)
+        if dropped:
+            self.data["suggestions"] = [suggestion for suggestion in self.data["suggestions"] if suggestion["id"] not in dropped]
+
+    # IDs of working-set suggestions that are also in the archive
+    def _archived_in_working_set(self):
+        return [suggestion["id"] for suggestion in self.data["suggestions"] if suggestion["id"] in self.archive]
+
+    # Call consume(suggestion, archived) with every suggestion: the working set on the event loop, then the archive in a
+    # worker thread, one member at a time, so the cold tier is never held in memory at once
+    # (suggestions archived while this runs are only passed once, from the working set)
+    async def for_each_suggestion(self, consume):
+        live_ids = set(self._by_id)
+        for suggestion in self.data["suggestions"]:
+            consume(suggestion, False)
+        if self.archive is not None:
+            def read_archive():
+                for suggestion in self.archive.iter_all(lambda suggestion_id, status: suggestion_id not in live_ids):
+                    consume(suggestion, True)
+            await asyncio.to_thread(read_archive)
+
+    # Move a suggestion to a new status bucket
+    def _move_status(self, suggestion: dict, status: str):
+        self._by_status.get(suggestion["status"], {}).pop(suggestion["id"], None)
+        self._by_status.setdefault(status, {})[suggestion["id"]] = suggestion
+        suggestion["status"] = status
+
+    # --- Suggestions ---
+
+    # Get a suggestion by its ID (None if it doesn't exist)
+    def get(self, suggestion_id: int):
+        return self._by_id.get(suggestion_id)
+
+    # Get an archived (closed) suggestion by its ID, read from the archive in a worker thread (None if it isn't archived)
+    async def get_archived(self, suggestion_id: int):
+        if self.archive is None or suggestion_id not in self.archive:
+            return None
+        return await asyncio.to_thread(self.archive.get, suggestion_id)
+
+    # Status of an archived suggestion (None if it isn't archived), without reading the archive
+    def archived_status(self, suggestion_id: int):
+        return self.archive.status_of(suggestion_id) if self.archive is not None else None
+
+    # Get a suggestion by the ID of its Discord message (None if it doesn't exist)
+    def get_by_message(self, message_id: int):
+        return self._by_message.get(message_id)
+
+    # List all suggestions with a given status (e.g. "pending") without scanning the whole history
+    def with_status(self, status: str):
+        return list(self._by_status.get(status, {}).values())
+
+    # Increment last_id and return a new unique suggestion ID
+    def next_id(self):
+        self.data["last_id"] += 1
+        self._changed({"op": "last_id", "last_id": self.data["last_id"]})
+        return self.data["last_id"]
+
+    # Add a new suggestion to the store
+    def add_suggestion(self, suggestion: dict):
+        self.data["suggestions"].append(suggestion)
+        self._index(suggestion)
+        self._changed({"op": "create", "suggestion": suggestion})
+
+    # Update suggestion status and staff response if given
+    def set_status(self, suggestion: dict, status: str, reason: str = None):
+        previous = suggestion["status"]
+        self._move_status(suggestion, status)
+        if reason:
+            suggestion["staff_response"] = reason
+        self._changed({"op": "status", "id": suggestion["id"], "status": status, "previous": previous, "staff_response": suggestion["staff_response"]})
+
+    # Save the detected language of a suggestion
+    def set_language(self, suggestion: dict, language: str):
+        if suggestion.get("language") != language:
+            suggestion["language"] = language
+            self._changed({"op": "language", "id": suggestion["id"], "language": language})
+
+    # --- Votes ---
+
+    # Add a user's vote to a suggestion (a user can only vote for one side)
+    # Returns the side they voted for before (None if they hadn't voted)
+    def add_vote(self, suggestion: dict, user_id: int, choice: str):
+        previous = suggestion["votes"].add(user_id, choice)
+        if previous != choice:
+            self._changed({"op": "vote_add", "id": suggestion["id"], "user_id": user_id, "choice": choice, "previous": previous})
+        return previous
+
+    # Remove a user's vote from a suggestion
+    # Returns True if the vote was there to remove
+    def remove_vote(self, suggestion: dict, user_id: int, choice: str):
+        removed = suggestion["votes"].remove(user_id, choice)
+        if removed:
+            self._changed({"op": "vote_remove", "id": suggestion["id"], "user_id": user_id, "choice": choice})
+        return removed
+
+    # --- Suggestion panel ---
+
+    # Get the current suggestion panel message ID (if any)
+    @property
+    def panel_id(self):
+        return self.data.get("panel_id")
+
+    # Update the suggestion panel message ID
+    def set_panel_id(self, message_id: int):
+        self.data["panel_id"] = message_id
+        self._changed({"op": "panel", "panel_id": message_id})
@@ -0,0 +1,8 @@
+# Overview
+# - Contains mention(), the shared way for cogs to refer to a user by ID
+# - Every message the bot posts about a user (review embeds, /votes, /suggestion_stats) only needs a mention, which
+#   Discord renders from the ID, so no command looks users up through the gateway cache or the REST API
+
+# Build a mention for a user ID (no lookup needed)
+def mention(user_id: int):
+    return f"<@{user_id}>"
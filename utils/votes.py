@@ -0,0 +1,112 @@
+# Overview
+# - Contains VoteSet, the in-memory vote storage for a single suggestion
+# - Each voter holds at most one vote (tick or cross), so membership checks and switching sides are O(1)
+# - Each side also keeps its voters in a list, so a page of voters (/votes) is a slice rather than a walk from the start;
+#   removing a vote moves the side's last voter into its place, so the listing order is not the voting order
+# - On disk, each side is stored as a sorted list of packed 64-bit user IDs (base64 encoded)
+
+# Libraries to import
+import base64
+import struct
+
+# Vote choices
+TICK = "tick"
+CROSS = "cross"
+CHOICES = (TICK, CROSS)
+
+# Pack a list of user IDs into base64 text (little-endian unsigned 64-bit integers, sorted)
+def pack_ids(user_ids):
+    user_ids = sorted(user_ids)
+    return base64.b64encode(struct.pack(f"<{len(user_ids)}Q", *user_ids)).decode("ascii")
+
+# Unpack base64 text produced by pack_ids() back into a tuple of user IDs
+def unpack_ids(text: str):
+    raw = base64.b64decode(text)
+    return struct.unpack(f"<{len(raw) // 8}Q", raw)
+
+# Votes for a single suggestion
+class VoteSet:
+    def __init__(self, tick_ids=(), cross_ids=()):
+        # A voter found on both sides keeps their tick vote
+        ticks = list(dict.fromkeys(tick_ids))
+        tick_set = set(ticks)
+        crosses = [user_id for user_id in dict.fromkeys(cross_ids) if user_id not in tick_set]
+        # Each side is a list of user IDs plus a dict of user ID -> position in that list
+        self._lists = {TICK: ticks, CROSS: crosses}
+        self._sides = {choice: {user_id: position for position, user_id in enumerate(self._lists[choice])} for choice in CHOICES}
+
+    # Get the side a user has voted for (None if they haven't voted)
+    def choice_of(self, user_id: int):
+        for choice in CHOICES:
+            if user_id in self._sides[choice]:
+                return choice
+        return None
+
+    # Add a user's vote, moving it off the other side if needed
+    # Returns the user's previous choice (None if they hadn't voted)
+    def add(self, user_id: int, choice: str):
+        previous = self.choice_of(user_id)
+        if previous != choice:
+            if previous:
+                self._discard(user_id, previous)
+            self._sides[choice][user_id] = len(self._lists[choice])
+            self._lists[choice].append(user_id)
+        return previous
+
+    # Remove a user's vote for the given side
+    # Returns True if the vote was there to remove
+    def remove(self, user_id: int, choice: str):
+        if user_id in self._sides[choice]:
+            self._discard(user_id, choice)
+            return True
+        return False
+
+    # Take a voter off a side, filling the gap with the side's last voter
+    def _discard(self, user_id: int, choice: str):
+        positions, voters = self._sides[choice], self._lists[choice]
+        position = positions.pop(user_id)
+        last = voters.pop()
+        if last != user_id:
+            voters[position] = last
+            positions[last] = position
+
+    # Number of votes for a side
+    def count(self, choice: str):
+        return len(self._sides[choice])
+
+    # Iterate over the user IDs that voted for a side
+    def voters(self, choice: str):
+        return iter(self._lists[choice])
+
+    # Up to limit user IDs that voted for a side, starting at the offset-th voter
+    def page(self, choice: str, offset: int, limit: int):
+        return self._lists[choice][offset:offset + limit]
+
+    # Convert into the compact form saved in suggestions.json
+    def to_json(self):
+        return {choice: pack_ids(self._lists[choice]) for choice in CHOICES}
+
+    # Build a VoteSet from suggestions.json
+    # Handles both the compact form and the old form ({"<:Tick:...>": [ids], "<:Cross:...>": [ids]})
+    @classmethod
+    def from_json(cls, votes: dict):
+        if isinstance(votes, VoteSet):
+            return votes
+        if all(isinstance(value, str) for value in votes.values()):
+            return cls(unpack_ids(votes.get(TICK, "")), unpack_ids(votes.get(CROSS, "")))
+        # Old form: lists of user IDs keyed by emoji string, tick first and cross second
+        sides = {TICK: [], CROSS: []}
+        for position, (emoji, user_ids) in enumerate(votes.items()):
+            if "tick" in emoji.lower():
+                sides[TICK] = user_ids
+            elif "cross" in emoji.lower():
+                sides[CROSS] = user_ids
+            else:
+                sides[CHOICES[min(position, 1)]] = user_ids
+        return cls(sides[TICK], sides[CROSS])
+
+# JSON encoder hook so json.dumps() can save suggestions that hold VoteSets
+def encode_votes(obj):
+    if isinstance(obj, VoteSet):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")